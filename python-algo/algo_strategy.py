@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 import time
 
 build_pos = {
@@ -471,7 +470,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
+        state = gamelib.load_state(turn_string)
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
@@ -10,20 +10,38 @@ Investigating it is useful for any player that wants to access more information
 The GameUnit class in unit.py represents a single unit. 
 Investigating it is useful for any player that wants to access information about units. \n
 
+The UnitStore class in unit_store.py keeps units in parallel arrays instead of GameUnit objects. 
+Investigating it is useful for players who scan the whole board often, such as for every damaged structure. \n
+
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
-util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+The ThreatMap class in threat_map.py records the damage enemy structures deal to mobile units on every tile. 
+Investigating it is useful for players who want to score many candidate paths or spawn locations at once. \n
+
+The BoardArrays class in board_arrays.py copies the structures on the board into one grid per stat, and computes threat, shield coverage and distances for the whole board at once. 
+It uses NumPy when it is installed and plain Python otherwise. \n
+
+The Simulator class in simulator.py plays out the action phase frame by frame from a GameState and a list of planned deploys. 
+Investigating it is useful for players who want to compare attack plans before submitting them. 
+Its estimate_attack function gives a much faster, rougher estimate for ranking many candidate attacks. \n
+
+util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write(), 
+and GameMessage, a message from the game engine that is decoded once and shared by every handler.
 """
 
 from .algocore import AlgoCore
-from .util import debug_write
+from .util import debug_write, GameMessage, load_state
 from .game_state import GameState
 from .unit import GameUnit
+from .unit_store import UnitStore
 from .game_map import GameMap
+from .threat_map import ThreatMap
+from .board_arrays import BoardArrays
+from .simulator import Simulator, BatchSimulator, SimulationResult, estimate_attack
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "board_arrays", "game_state", "game_map", "navigation", "simulator", "threat_map", "unit", "unit_store", "util"]
  
\ No newline at end of file
@@ -1,7 +1,5 @@
-import json
-
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_command, debug_write, BANNER_TEXT, send_command, GameMessage
 
 class AlgoCore(object):
     """
@@ -26,7 +24,8 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        It is passed the current game state as a GameMessage, which can be used to initiate a new GameState object
+        without decoding it again. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -40,6 +39,8 @@ class AlgoCore(object):
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
         They can be handled in this function. 
+        Each frame is a GameMessage, read its state attribute rather than decoding it again.
+        Frames are only decoded if they are read, and if this function is not overridden they are skipped entirely.
         """
         pass
 
@@ -52,20 +53,16 @@ class AlgoCore(object):
         The algo continues this loop until it receives the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        handles_action_frames = type(self).on_action_frame is not AlgoCore.on_action_frame
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+            game_state_string = GameMessage(get_command())
+            # Only the turnInfo numbers are read here, the rest of the message is decoded if a handler reads game_state_string.state
+            turn_info = game_state_string.turn_info
+            if turn_info is not None:
+                stateType = turn_info[0]
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
@@ -76,7 +73,8 @@ class AlgoCore(object):
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    if handles_action_frames:
+                        self.on_action_frame(game_state_string)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
@@ -88,6 +86,11 @@ class AlgoCore(object):
                     Something is wrong? Received an incorrect or improperly formatted string.
                     """
                     debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+            elif "replaySave" in game_state_string:
+                """
+                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+                """
+                self.on_game_start(game_state_string.state)
             else:
                 """
                 Something is wrong? Received an incorrect or improperly formatted string.
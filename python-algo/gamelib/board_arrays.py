@@ -0,0 +1,196 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .game_map import ARENA_SIZE, IN_BOUNDS, VALID_LOCATIONS, EDGE_LOCATIONS, get_range_stencil
+from .navigation import DynamicDistanceField
+from .threat_map import ThreatMap
+
+HAS_NUMPY = np is not None
+
+
+class BoardArrays:
+    """The structures on the board as one grid per stat, for board wide queries.
+
+    With NumPy installed the grids are 28x28 arrays and every query is a handful of array
+    operations: threat and shield coverage are sums of shifted copies of the stat grids, one
+    per stencil offset, and distance fields grow one array wide step at a time. Without NumPy
+    the grids are lists of lists and the queries fall back to ThreatMap and DynamicDistanceField.
+    Either way a grid is indexed as grid[x][y], and tiles outside the arena are 0, False or -1.
+
+    The grids are a snapshot, build a new BoardArrays after the board changes.
+
+    Attributes :
+        * use_numpy (bool): Whether the grids are NumPy arrays
+        * unit_type (grid): The index into config["unitInformation"] of the structure on each tile, -1 if empty
+        * owner (grid): The player_index of the structure on each tile, -1 if empty
+        * health (grid): The health of the structure on each tile
+        * upgraded (grid): True if the structure on a tile is upgraded
+        * damage_i (grid): The damage each structure deals to mobile units
+        * damage_f (grid): The damage each structure deals to structures
+        * attack_range (grid): The attackRange of each structure
+        * shield_range (grid): The shieldRange of each structure
+        * shield_per_unit (grid): The shieldPerUnit of each structure
+        * shield_bonus_per_y (grid): The shieldBonusPerY of each structure
+
+    """
+    STATS = ["unit_type", "owner", "health", "upgraded", "damage_i", "damage_f", "attack_range",
+             "shield_range", "shield_per_unit", "shield_bonus_per_y"]
+
+    def __init__(self, game_state, use_numpy=None):
+        """ Reads every structure on the board into the stat grids
+
+        Args:
+            game_state: The GameState to read structures from
+            use_numpy: Whether to use NumPy arrays, defaults to True when NumPy is installed
+
+        """
+        from .game_state import UNIT_TYPE_TO_INDEX
+        self.game_state = game_state
+        self.use_numpy = HAS_NUMPY if use_numpy is None else use_numpy and HAS_NUMPY
+        grids = {stat: [[0] * ARENA_SIZE for _ in range(ARENA_SIZE)] for stat in self.STATS}
+        for x in range(ARENA_SIZE):
+            for y in range(ARENA_SIZE):
+                grids["unit_type"][x][y] = -1
+                grids["owner"][x][y] = -1
+                grids["upgraded"][x][y] = False
+        for x, y in VALID_LOCATIONS:
+            for unit in game_state.game_map[x, y]:
+                if not unit.stationary:
+                    continue
+                grids["unit_type"][x][y] = UNIT_TYPE_TO_INDEX[unit.unit_type]
+                grids["owner"][x][y] = unit.player_index
+                grids["health"][x][y] = unit.health
+                grids["upgraded"][x][y] = unit.upgraded
+                grids["damage_i"][x][y] = unit.damage_i
+                grids["damage_f"][x][y] = unit.damage_f
+                grids["attack_range"][x][y] = unit.attackRange
+                grids["shield_range"][x][y] = unit.shieldRange
+                grids["shield_per_unit"][x][y] = unit.shieldPerUnit
+                grids["shield_bonus_per_y"][x][y] = unit.shieldBonusPerY
+        for stat, grid in grids.items():
+            if self.use_numpy:
+                grid = np.array(grid, dtype=bool if stat == "upgraded" else int if stat in ("unit_type", "owner") else float)
+            setattr(self, stat, grid)
+        if self.use_numpy:
+            self._in_bounds = np.array(IN_BOUNDS, dtype=bool).reshape(ARENA_SIZE, ARENA_SIZE)
+
+    def blocked_mask(self):
+        """Gets the tiles that mobile units cannot walk through
+
+        Returns:
+            A grid that is True where there is a structure
+
+        """
+        if self.use_numpy:
+            return self.owner >= 0
+        return [[owner >= 0 for owner in column] for column in self.owner]
+
+    def threat(self, player_index):
+        """Gets the damage and number of attackers enemy structures bring to bear on every tile.
+        Matches ThreatMap, and GameState.get_attackers when there are no mobile units on the board.
+
+        Args:
+            player_index: The player that controls the mobile units being attacked, 0 for you 1 for the enemy
+
+        Returns:
+            A (damage, attackers) pair of grids
+
+        """
+        if not self.use_numpy:
+            threats = ThreatMap(self.game_state)
+            damage = [[0] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+            attackers = [[0] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+            for x, y in VALID_LOCATIONS:
+                damage[x][y] = threats.get_damage([x, y], player_index)
+                attackers[x][y] = threats.get_attacker_count([x, y], player_index)
+            return damage, attackers
+
+        sources = (self.owner == 1 - player_index) & (self.damage_i + self.damage_f > 0)
+        damage = np.zeros((ARENA_SIZE, ARENA_SIZE))
+        attackers = np.zeros((ARENA_SIZE, ARENA_SIZE), dtype=int)
+        for attack_range in np.unique(self.attack_range[sources]):
+            group = sources & (self.attack_range == attack_range)
+            offsets = get_range_stencil(float(attack_range), 0, True).offsets
+            damage += self._convolve(np.where(group, self.damage_i, 0), offsets)
+            attackers += self._convolve(group.astype(int), offsets)
+        return damage, attackers
+
+    def shield_coverage(self, player_index):
+        """Gets the total shield a mobile unit would receive from friendly supports on every tile.
+        A support gives shieldPerUnit plus shieldBonusPerY for every row it sits away from
+        its owner's side of the board, to units within its shieldRange.
+
+        Args:
+            player_index: The player that controls the mobile units being shielded, 0 for you 1 for the enemy
+
+        Returns:
+            A grid of shield amounts
+
+        """
+        if not self.use_numpy:
+            coverage = [[0] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+            for x, y in VALID_LOCATIONS:
+                if self.owner[x][y] != player_index or self.shield_per_unit[x][y] + self.shield_bonus_per_y[x][y] <= 0:
+                    continue
+                row = y if player_index == 0 else ARENA_SIZE - 1 - y
+                amount = self.shield_per_unit[x][y] + self.shield_bonus_per_y[x][y] * row
+                for i, j in get_range_stencil(self.shield_range[x][y], 0, True).locations(x, y):
+                    coverage[i][j] += amount
+            return coverage
+
+        rows = np.arange(ARENA_SIZE) if player_index == 0 else ARENA_SIZE - 1 - np.arange(ARENA_SIZE)
+        sources = (self.owner == player_index) & (self.shield_per_unit + self.shield_bonus_per_y > 0)
+        amount = np.where(sources, self.shield_per_unit + self.shield_bonus_per_y * rows[np.newaxis, :], 0)
+        coverage = np.zeros((ARENA_SIZE, ARENA_SIZE))
+        for shield_range in np.unique(self.shield_range[sources]):
+            group = sources & (self.shield_range == shield_range)
+            coverage += self._convolve(np.where(group, amount, 0), get_range_stencil(float(shield_range), 0, True).offsets)
+        return coverage
+
+    def distance_to_edge(self, target_edge):
+        """Gets the number of steps from every tile to an edge, walking around structures.
+        Follows the same rules as the distance fields used for pathing: edge tiles are 0,
+        blocked edge tiles are not walked through, and unreachable tiles are -1.
+
+        Args:
+            target_edge: The edge to measure to, an index into GameMap.get_edges()
+
+        Returns:
+            A grid of distances
+
+        """
+        blocked = self.blocked_mask()
+        if not self.use_numpy:
+            flat = [blocked[x][y] for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+            field = DynamicDistanceField(flat, target_edge).field
+            return [field[x * ARENA_SIZE:(x + 1) * ARENA_SIZE] for x in range(ARENA_SIZE)]
+
+        walkable = self._in_bounds & ~blocked
+        distance = np.full((ARENA_SIZE, ARENA_SIZE), -1, dtype=int)
+        xs, ys = zip(*EDGE_LOCATIONS[target_edge])
+        distance[xs, ys] = 0
+        frontier = np.zeros((ARENA_SIZE, ARENA_SIZE), dtype=bool)
+        frontier[xs, ys] = True
+        frontier &= walkable
+        step = 0
+        while frontier.any():
+            step += 1
+            grown = np.zeros_like(frontier)
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            frontier = grown & walkable & (distance == -1)
+            distance[frontier] = step
+        return distance
+
+    def _convolve(self, values, offsets):
+        """Sums values shifted by every (dx, dy, distance) offset, clipped to the arena
+        """
+        pad = max(max(abs(dx), abs(dy)) for dx, dy, _ in offsets)
+        padded = np.zeros((ARENA_SIZE + 2 * pad, ARENA_SIZE + 2 * pad), dtype=values.dtype)
+        for dx, dy, _ in offsets:
+            padded[pad + dx:pad + dx + ARENA_SIZE, pad + dy:pad + dy + ARENA_SIZE] += values
+        return np.where(self._in_bounds, padded[pad:pad + ARENA_SIZE, pad:pad + ARENA_SIZE], 0)
@@ -1,7 +1,170 @@
 import math
+import copy
+import random
 from .unit import GameUnit
 from .util import debug_write
 
+"""
+Static board geometry, built once when the module is imported and shared by every GameMap.
+Tiles are indexed by x * ARENA_SIZE + y in the flat tables and bitboards.
+"""
+ARENA_SIZE = 28
+HALF_ARENA = 14
+NUM_TILES = ARENA_SIZE * ARENA_SIZE
+
+
+def _build_in_bounds_mask():
+    """Builds a flat list where mask[x * ARENA_SIZE + y] is True if [x, y] is on the diamond shaped board
+    """
+    mask = [False] * NUM_TILES
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        startx = HALF_ARENA - row_size
+        for x in range(startx, startx + 2 * row_size):
+            mask[x * ARENA_SIZE + y] = True
+    return mask
+
+
+IN_BOUNDS = _build_in_bounds_mask()
+# Valid tile indices in increasing index order
+VALID_INDICES = [index for index in range(NUM_TILES) if IN_BOUNDS[index]]
+# Valid locations in the order GameMap iterates them: row by row from the bottom, left to right
+VALID_LOCATIONS = [(x, y) for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if IN_BOUNDS[x * ARENA_SIZE + y]]
+# Edge locations in the order of GameMap.get_edges: top_right, top_left, bottom_left, bottom_right
+EDGE_LOCATIONS = [
+    [[HALF_ARENA + num, ARENA_SIZE - 1 - num] for num in range(HALF_ARENA)],
+    [[HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num] for num in range(HALF_ARENA)],
+    [[HALF_ARENA - 1 - num, num] for num in range(HALF_ARENA)],
+    [[HALF_ARENA + num, num] for num in range(HALF_ARENA)]]
+EDGE_INDICES = [[x * ARENA_SIZE + y for x, y in edge] for edge in EDGE_LOCATIONS]
+EDGE_SETS = [frozenset((x, y) for x, y in edge) for edge in EDGE_LOCATIONS]
+# Bitboards of the valid tiles on each half of the board. The bottom half is player 0's territory
+BOTTOM_HALF_MASK = sum(1 << (x * ARENA_SIZE + y) for x, y in VALID_LOCATIONS if y < HALF_ARENA)
+TOP_HALF_MASK = sum(1 << (x * ARENA_SIZE + y) for x, y in VALID_LOCATIONS if y >= HALF_ARENA)
+
+
+class RangeStencil:
+    """The offsets of every tile within range of a tile, for one (radius, getHitRadius) pair.
+
+    A location is in range if its center is closer than radius + getHitRadius, the same rule as
+    GameMap.get_locations_in_range. Inclusive stencils instead hold the locations at most radius
+    away, the rule structures use to pick targets. The offsets are translated and clipped to the
+    board once per center tile, the first time that tile is queried, so later queries are a table lookup.
+
+    Attributes :
+        * radius (float): The range of the stencil
+        * hit_radius (float): The getHitRadius added to the range
+        * inclusive (bool): Whether the stencil uses distance <= radius instead
+        * offsets (list): (dx, dy, distance) tuples in the order get_locations_in_range returns them
+
+    """
+    def __init__(self, radius, hit_radius, inclusive=False):
+        self.radius = radius
+        self.hit_radius = hit_radius
+        self.inclusive = inclusive
+        search_radius = math.ceil(radius)
+        self.offsets = []
+        for dx in range(-search_radius, search_radius + 1):
+            for dy in range(-search_radius, search_radius + 1):
+                distance = math.sqrt(dx ** 2 + dy ** 2)
+                if (distance <= radius) if inclusive else (distance < radius + hit_radius):
+                    self.offsets.append((dx, dy, distance))
+        self._locations = [None] * NUM_TILES
+
+    def locations(self, x, y):
+        """Gets the in bounds locations within range of [x, y]
+
+        Returns:
+            A tuple of (x, y) tuples. Shared between callers, so it must not be modified.
+
+        """
+        if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+            index = x * ARENA_SIZE + y
+            locations = self._locations[index]
+            if locations is None:
+                locations = self._clip(x, y)
+                self._locations[index] = locations
+            return locations
+        return self._clip(x, y)
+
+    def _clip(self, x, y):
+        locations = []
+        for dx, dy, _ in self.offsets:
+            i = x + dx
+            j = y + dy
+            if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and IN_BOUNDS[i * ARENA_SIZE + j]:
+                locations.append((i, j))
+        return tuple(locations)
+
+
+"""
+Zobrist keys for board hashing. Each (tile, owner, unit type, upgraded) combination gets a fixed random
+64 bit key, and a board's hash is the XOR of the keys of its structures. The keys come from a seeded
+generator so hashes are the same in every process and every turn.
+"""
+ZOBRIST_TYPES = 8
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_KEYS = [_zobrist_random.getrandbits(64) for _ in range(NUM_TILES * 2 * ZOBRIST_TYPES * 2)]
+_HEALTH_KEYS = {}
+
+
+def get_zobrist_key(index, player_index, type_id, upgraded):
+    """Gets the Zobrist key of a structure
+
+    Args:
+        index: The tile index, x * ARENA_SIZE + y
+        player_index: The owner of the structure, 0 or 1
+        type_id: The index of the structure's type in config["unitInformation"]
+        upgraded: If the structure is upgraded
+
+    Returns:
+        A 64 bit int
+
+    """
+    return ZOBRIST_KEYS[((index * 2 + player_index) * ZOBRIST_TYPES + type_id) * 2 + (1 if upgraded else 0)]
+
+
+def get_health_keys(buckets):
+    """Gets the Zobrist keys of every (tile, health bucket) pair for a number of buckets, building them the first time
+
+    Args:
+        buckets: The number of health buckets
+
+    Returns:
+        A list where entry index * buckets + bucket is the key of a structure on tile index with health in that bucket
+
+    """
+    keys = _HEALTH_KEYS.get(buckets)
+    if keys is None:
+        generator = random.Random(buckets)
+        keys = [generator.getrandbits(64) for _ in range(NUM_TILES * buckets)]
+        _HEALTH_KEYS[buckets] = keys
+    return keys
+
+
+_STENCILS = {}
+
+
+def get_range_stencil(radius, hit_radius, inclusive=False):
+    """Gets the RangeStencil for a radius and getHitRadius, building it the first time it is requested
+
+    Args:
+        radius: The radius of the search area
+        hit_radius: The getHitRadius of the units being searched for
+        inclusive: If True, use distance <= radius and ignore hit_radius
+
+    Returns:
+        A RangeStencil shared by every caller
+
+    """
+    key = (radius, hit_radius, inclusive)
+    stencil = _STENCILS.get(key)
+    if stencil is None:
+        stencil = RangeStencil(radius, hit_radius, inclusive)
+        _STENCILS[key] = stencil
+    return stencil
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +172,13 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    The locations of structures are also kept as one bitboard per player, an int where bit
+    x * ARENA_SIZE + y is set if that player has a structure at [x, y], and the locations of
+    every unit are indexed by (player_index, unit_type) for get_unit_locations and count_units.
+    Add and remove units with add_unit and remove_unit (or assign a whole list with
+    game_map[x, y] = units) so the bitboards and index stay in sync; appending to game_map[x, y]
+    directly bypasses them.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -36,7 +206,16 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__iter_index = 0
+        self._structure_bits = [0, 0]
+        self._shared_columns = [False] * self.ARENA_SIZE
+        self._tile_counts = [None] * NUM_TILES
+        self._type_index = {}
+        self._sorted_tiles = {}
+        self._type_ids = {type_config.get("shorthand"): i for i, type_config in enumerate(self.config["unitInformation"])}
+        self._tile_hashes = [0] * NUM_TILES
+        self._board_hash = 0
+        self._hit_radius = self.config["unitInformation"][0]['getHitRadius']
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -46,26 +225,22 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
+            self._own_column(location[0])
             self.__map[location[0]][location[1]] = val
+            self._update_structure_bits(location[0], location[1])
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
+        self.__iter_index = 0
         return self
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        if self.__iter_index == len(VALID_LOCATIONS):
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        x, y = VALID_LOCATIONS[self.__iter_index]
+        self.__iter_index += 1
+        return [x, y]
 
     def __empty_grid(self):
         grid = []
@@ -75,6 +250,221 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def fork(self):
+        """Makes a copy of this map that shares its columns until one of the two maps changes them.
+        A column is copied, along with the units in it, the first time add_unit, remove_unit or
+        game_map[x, y] = units changes it, so a fork costs a few list copies plus the columns it touches.
+        The bitboards and the unit type index are copied when forking.
+        Units read with game_map[x, y] may still be shared with other forks, so change units through
+        GameMap and GameState functions such as attempt_upgrade rather than directly.
+
+        Returns:
+            A new GameMap with the same units
+
+        """
+        forked = GameMap.__new__(GameMap)
+        forked.__dict__.update(self.__dict__)
+        forked.__map = list(self.__map)
+        forked.__iter_index = 0
+        forked._structure_bits = list(self._structure_bits)
+        forked._tile_counts = list(self._tile_counts)
+        forked._type_index = {key: dict(tiles) for key, tiles in self._type_index.items()}
+        forked._sorted_tiles = {}
+        forked._tile_hashes = list(self._tile_hashes)
+        self._shared_columns = [True] * self.ARENA_SIZE
+        forked._shared_columns = [True] * self.ARENA_SIZE
+        return forked
+
+    def _own_column(self, x):
+        """Copies column x and its units if it is shared with a fork, so it can be changed
+        """
+        if self._shared_columns[x]:
+            self.__map[x] = [[copy.copy(unit) for unit in units] for units in self.__map[x]]
+            self._shared_columns[x] = False
+
+    def _update_structure_bits(self, x, y):
+        """Sets the bitboard bits, the unit type index and the board hash for [x, y] from the units currently at that location.
+        Call it again after upgrading a unit at [x, y].
+        """
+        index = x * ARENA_SIZE + y
+        mask = ~(1 << index)
+        self._structure_bits[0] &= mask
+        self._structure_bits[1] &= mask
+        counts = {}
+        structure_found = False
+        for unit in self.__map[x][y]:
+            key = (unit.player_index, unit.unit_type)
+            counts[key] = counts.get(key, 0) + 1
+            if unit.stationary and not structure_found:
+                owner = 1 if unit.player_index == 1 else 0
+                self._structure_bits[owner] |= 1 << index
+                tile_hash = get_zobrist_key(index, owner, self._type_ids[unit.unit_type], unit.upgraded)
+                structure_found = True
+        if not structure_found:
+            tile_hash = 0
+        self._board_hash ^= self._tile_hashes[index] ^ tile_hash
+        self._tile_hashes[index] = tile_hash
+
+        old_counts = self._tile_counts[index]
+        if old_counts:
+            for key in old_counts:
+                del self._type_index[key][index]
+        for key, count in counts.items():
+            self._type_index.setdefault(key, {})[index] = count
+        self._tile_counts[index] = counts or None
+        if self._sorted_tiles:
+            self._sorted_tiles = {}
+
+    def _get_indexed_tiles(self, player_index=None, unit_type=None):
+        """Gets the {tile index: unit count} dicts of the index entries matching a player and unit type
+        """
+        return [tiles for (owner, indexed_type), tiles in self._type_index.items()
+                if (player_index is None or owner == player_index) and (unit_type is None or indexed_type == unit_type)]
+
+    def _get_sorted_tiles(self, player_index, unit_types):
+        """Gets the tile indices holding units of a player and any of the given types, in increasing order.
+        Cached until the map changes.
+        """
+        key = (player_index, tuple(unit_types))
+        indices = self._sorted_tiles.get(key)
+        if indices is None:
+            found = set()
+            for unit_type in unit_types:
+                for tiles in self._get_indexed_tiles(player_index, unit_type):
+                    found.update(tiles)
+            indices = sorted(found)
+            self._sorted_tiles[key] = indices
+        return indices
+
+    def get_unit_locations(self, player_index=None, unit_type=None):
+        """Gets the locations of every unit of a player and type, using the unit type index.
+        Takes time proportional to the number of locations found rather than the size of the board.
+
+        Args:
+            player_index: The player whose units we want, 0 for you 1 for the enemy. Both players if None.
+            unit_type: The type of unit we want, such as TURRET. Every type if None.
+
+        Returns:
+            A list of locations in x major order, each listed once
+
+        """
+        return [[index // ARENA_SIZE, index % ARENA_SIZE] for index in self._get_sorted_tiles(player_index, [unit_type])]
+
+    def count_units(self, player_index=None, unit_type=None):
+        """Counts the units of a player and type, using the unit type index
+
+        Args:
+            player_index: The player whose units we want, 0 for you 1 for the enemy. Both players if None.
+            unit_type: The type of unit we want, such as TURRET. Every type if None.
+
+        Returns:
+            The number of matching units on the board
+
+        """
+        return sum(sum(tiles.values()) for tiles in self._get_indexed_tiles(player_index, unit_type))
+
+    def get_nearest_unit_location(self, location, player_index=None, unit_type=None):
+        """Gets the closest location holding a unit of a player and type, using the unit type index
+
+        Args:
+            location: The location to measure from
+            player_index: The player whose units we want, 0 for you 1 for the enemy. Both players if None.
+            unit_type: The type of unit we want, such as TURRET. Every type if None.
+
+        Returns:
+            The closest matching location, the first in x major order if several are equally close,
+            or None if there are no matching units
+
+        """
+        x, y = location
+        nearest = None
+        for tiles in self._get_indexed_tiles(player_index, unit_type):
+            for index in tiles:
+                key = ((index // ARENA_SIZE - x) ** 2 + (index % ARENA_SIZE - y) ** 2, index)
+                if nearest is None or key < nearest:
+                    nearest = key
+        if nearest is None:
+            return None
+        return [nearest[1] // ARENA_SIZE, nearest[1] % ARENA_SIZE]
+
+    def get_structure_bitboard(self, player_index=None):
+        """Gets the locations of structures as a bitboard
+
+        Args:
+            player_index: The player whose structures we want, 0 for you 1 for the enemy. Both players if None.
+
+        Returns:
+            An int where bit x * ARENA_SIZE + y is set if there is a structure at [x, y]
+
+        """
+        if player_index is None:
+            return self._structure_bits[0] | self._structure_bits[1]
+        return self._structure_bits[player_index]
+
+    def get_board_hash(self, health_buckets=0):
+        """Gets a 64 bit Zobrist hash of the structures on the board, covering the location, owner, type
+        and upgrade of every structure. It is kept up to date as units are added, removed and upgraded,
+        so reading it is O(1), and equal boards have equal hashes however they were built.
+
+        Args:
+            health_buckets: If above 0, the health of each structure is also hashed, split into this many
+                equal buckets of its max_health. This walks every structure, since health changes are not tracked.
+
+        Returns:
+            A 64 bit int
+
+        """
+        if health_buckets <= 0:
+            return self._board_hash
+        keys = get_health_keys(health_buckets)
+        board_hash = self._board_hash
+        bits = self._structure_bits[0] | self._structure_bits[1]
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            bits ^= low
+            for unit in self.__map[index // ARENA_SIZE][index % ARENA_SIZE]:
+                if unit.stationary:
+                    fraction = unit.health / unit.max_health if unit.max_health > 0 else 1
+                    board_hash ^= keys[index * health_buckets + min(max(int(fraction * health_buckets), 0), health_buckets - 1)]
+                    break
+        return board_hash
+
+    def get_structure_fingerprint(self):
+        """Gets a hashable key describing where each player's structures are.
+        Two maps with the same structure locations and owners have the same fingerprint.
+
+        Returns:
+            A tuple of the two players' structure bitboards
+
+        """
+        return (self._structure_bits[0], self._structure_bits[1])
+
+    def is_blocked(self, location):
+        """Checks if there is a structure at a location using the bitboards
+
+        Args:
+            location: A map location
+
+        Returns:
+            True if either player has a structure at the location, False otherwise
+
+        """
+        x, y = map(int, location)
+        return bool(((self._structure_bits[0] | self._structure_bits[1]) >> (x * ARENA_SIZE + y)) & 1)
+
+    def _get_blocked(self):
+        """Builds a flat list where blocked[x * ARENA_SIZE + y] is True if there is a structure at [x, y].
+        Used by navigation to fill in walls from the bitboards.
+        """
+        blocked = [False] * NUM_TILES
+        bits = self._structure_bits[0] | self._structure_bits[1]
+        while bits:
+            lowest = bits & -bits
+            blocked[lowest.bit_length() - 1] = True
+            bits ^= lowest
+        return blocked
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,19 +479,9 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+            return IN_BOUNDS[int(x) * ARENA_SIZE + int(y)]
+        return False
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -117,8 +497,20 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [list(location) for location in EDGE_LOCATIONS[quadrant_description]]
+
+    def is_edge_location(self, location, quadrant_description):
+        """Checks if a location is on an edge
+
+        Args:
+            location: A map location
+            quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            True if the location is on the requested edge, False otherwise
+
+        """
+        return tuple(location) in EDGE_SETS[quadrant_description]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,27 +519,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[list(location) for location in edge] for edge in EDGE_LOCATIONS]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -167,11 +539,13 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
+        self._own_column(x)
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
             self.__map[x][y].append(new_unit)
         else:
             self.__map[x][y] = [new_unit]
+        self._update_structure_bits(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,7 +560,9 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        self._own_column(x)
         self.__map[x][y] = []
+        self._update_structure_bits(x, y)
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -204,17 +580,23 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
-        x, y = location
-        locations = []
-        search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
-        for i in range(int(x - search_radius), int(x + search_radius + 1)):
-            for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations whose centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+        x, y = map(int, location)
+        return [[i, j] for i, j in get_range_stencil(radius, self._hit_radius).locations(x, y)]
+
+    def iter_locations_in_range(self, location, radius):
+        """Iterates over the locations in a circular area around a location without building a new list.
+        Visits the same locations, in the same order, as get_locations_in_range.
+
+        Args:
+            location: The center of our search area
+            radius: The radius of our search area
+
+        Returns:
+            An iterator of (x, y) tuples
+
+        """
+        x, y = map(int, location)
+        return iter(get_range_stencil(radius, self._hit_radius).locations(x, y))
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
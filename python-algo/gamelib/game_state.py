@@ -1,11 +1,12 @@
 import math
+import copy
 import json
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
-from .game_map import GameMap
+from .util import send_command, debug_write, load_state
+from .unit import GameUnit, UnitTypeTable
+from .game_map import GameMap, get_range_stencil
 
 def is_stationary(unit_type):
     """
@@ -52,7 +53,8 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              A GameMessage or an already decoded dict is used without decoding the json again.
 
         """
         self.serialized_string = serialized_string
@@ -89,10 +91,15 @@ class GameState:
         MP = self.MP
         SP = self.SP
 
+        unit_table = UnitTypeTable.for_config(self.config)
+        self._attacker_types = [unit_type for unit_type in ALL_UNITS
+                                if any(stats[unit_type].damage_i + stats[unit_type].damage_f > 0 for stats in (unit_table.base, unit_table.upgraded))]
+        self._max_attack_range = max(stats[unit_type].attackRange for unit_type in ALL_UNITS for stats in (unit_table.base, unit_table.upgraded))
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
         self._build_stack = []
         self._deploy_stack = []
+        self._undo_log = None
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
@@ -101,9 +108,9 @@ class GameState:
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, a GameMessage or a decoded dict.
         """
-        state = json.loads(state_line)
+        state = load_state(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -145,9 +152,11 @@ class GameState:
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].upgrade()
+                        self.game_map._update_structure_bits(x, y)
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
                     self.game_map[x,y].append(unit)
+                    self.game_map._update_structure_bits(x, y)
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -163,8 +172,16 @@ class GameState:
         elif resource_type == self.SP:
             resource_key = 'SP'
         held_resource = self.get_resource(resource_type, player_index)
+        if self._undo_log is not None:
+            self._undo_log.append(("resource", player_index, resource_key, self._player_resources[player_index][resource_key]))
         self._player_resources[player_index][resource_key] = held_resource + amount
 
+    def _log_tile(self, x, y):
+        """Records the units at [x, y] in the undo log, if a speculation is running
+        """
+        if self._undo_log is not None:
+            self._undo_log.append(("tile", x, y, list(self.game_map[x, y])))
+
     def _invalid_player_index(self, index):
         self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
     
@@ -331,9 +348,9 @@ class GameState:
 
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
-        blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
+        blocked = self.game_map.is_blocked(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = self.game_map.is_edge_location(location, self.game_map.BOTTOM_LEFT) or self.game_map.is_edge_location(location, self.game_map.BOTTOM_RIGHT)
 
         if self.enable_warnings:
             fail_reason = ""
@@ -381,6 +398,7 @@ class GameState:
                     costs = self.type_cost(unit_type)
                     self.__set_resource(SP, 0 - costs[SP])
                     self.__set_resource(MP, 0 - costs[MP])
+                    self._log_tile(x, y)
                     self.game_map.add_unit(unit_type, location, 0)
                     if is_stationary(unit_type):
                         self._build_stack.append((unit_type, x, y))
@@ -434,6 +452,7 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
+                self.game_map._own_column(x)
                 existing_unit = None
                 for unit in self.game_map[x,y]:
                     if unit.stationary:
@@ -445,13 +464,65 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
+                        if self._undo_log is not None:
+                            # Upgrade a copy so rolling back can put the original unit back
+                            self._log_tile(x, y)
+                            upgraded_unit = copy.copy(existing_unit)
+                            self.game_map[x, y] = [upgraded_unit if unit is existing_unit else unit for unit in self.game_map[x, y]]
+                            existing_unit = upgraded_unit
                         existing_unit.upgrade()
+                        self.game_map._update_structure_bits(x, y)
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
         return spawned_units
 
+    def fork(self):
+        """Makes a cheap copy of this GameState to try out moves on, for example when searching over builds.
+        The copy has its own resources, build and deploy stacks, and a forked GameMap that shares
+        columns with this one until either changes them. The config and path caches are shared.
+
+        Returns:
+            A new GameState that can be changed without affecting this one
+
+        """
+        forked = copy.copy(self)
+        forked.game_map = self.game_map.fork()
+        forked._build_stack = list(self._build_stack)
+        forked._deploy_stack = list(self._deploy_stack)
+        forked._player_resources = [dict(resources) for resources in self._player_resources]
+        # A fork made inside a speculation is not part of it
+        forked._undo_log = None
+        return forked
+
+    @property
+    def board_hash(self):
+        """A 64 bit Zobrist hash of the structures on the board, for keying transposition tables.
+        It is updated as structures are spawned, upgraded and removed, including inside speculate()
+        and on forks, so the same layout reached through different build orders has the same hash.
+        Use game_map.get_board_hash to also hash structure health.
+        """
+        return self.game_map.get_board_hash()
+
+    def speculate(self):
+        """Starts a speculation, so a plan can be tried and then undone.
+        Resources, map changes and the build and deploy stacks changed by attempt_spawn, attempt_upgrade
+        and attempt_remove are recorded, and are rolled back when the with block ends unless the
+        speculation was committed. Speculations can be nested, and rolling back an outer speculation
+        also undoes inner ones that were committed.
+
+            with game_state.speculate() as speculation:
+                game_state.attempt_spawn(TURRET, [13, 10])
+                if game_state.get_attackers([13, 13], 1):
+                    speculation.commit()
+
+        Returns:
+            A Speculation to use as a context manager
+
+        """
+        return Speculation(self)
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -495,8 +566,133 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        if self.game_map.get_edge_locations(target_edge) is None:
+            return
+        return self._shortest_path_finder.navigate_to_edge(start_location, target_edge, self)
+
+    def find_paths_batch(self, start_locations, target_edge=None):
+        """Gets the paths units at many locations would take.
+        Faster than calling find_path_to_edge in a loop, since the blocked grid,
+        pockets and distance fields are built once and shared by every location.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+
+        Returns:
+            A list with the path for each start location, in the same order.
+            The entry is None if the start location is blocked or out of bounds.
+
+        """
+        if target_edge is not None and self.game_map.get_edge_locations(target_edge) is None:
+            return
+
+        target_edges = []
+        for location in start_locations:
+            if not self.game_map.in_arena_bounds(location):
+                self.warn("Attempted to perform pathing from out of bounds location {}".format(location))
+            elif self.contains_stationary_unit(location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(location))
+            target_edges.append(self.get_target_edge(location) if target_edge is None else target_edge)
+        return self._shortest_path_finder.navigate_batch(start_locations, target_edges, self)
+
+    def get_path_policy(self, start_location, target_edge=None):
+        """Gets the PathPolicy a unit at a given location would follow.
+        The policy can be queried with policy.get_path(location) for any other location
+        following the same distance field, which makes reading many paths a table walk.
+        It stays valid until structures are added or removed.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            A PathPolicy, or None if start_location is blocked or out of bounds
+
+        """
+        if not self.game_map.in_arena_bounds(start_location) or self.contains_stationary_unit(start_location):
+            self.warn("Attempted to get a path policy from invalid or blocked location {}".format(start_location))
+            return
+
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+        if self.game_map.get_edge_locations(target_edge) is None:
+            return
+        cache = self._shortest_path_finder.get_distance_field_cache(self)
+        return cache.get_policy(start_location[0] * self.ARENA_SIZE + start_location[1], target_edge)
+
+    def find_paths_from_all_spawns(self, player_index=0):
+        """Gets the path a unit would take from every deployable edge location of a player
+
+        Args:
+            player_index: The index corresponding to the player whose spawn locations we path from, 0 for you 1 for the enemy
+
+        Returns:
+            A dict mapping each unblocked edge location (as an (x, y) tuple) to the path a unit spawned there would take
+
+        """
+        if not player_index == 1 and not player_index == 0:
+            self._invalid_player_index(player_index)
+            return
+
+        if player_index == 0:
+            edges = [self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT]
+        else:
+            edges = [self.game_map.TOP_LEFT, self.game_map.TOP_RIGHT]
+        locations = []
+        for edge in edges:
+            for location in self.game_map.get_edge_locations(edge):
+                if not self.contains_stationary_unit(location):
+                    locations.append(location)
+
+        paths = self.find_paths_batch(locations)
+        return {tuple(location): path for location, path in zip(locations, paths)}
+
+    def what_if_block(self, locations, start_locations=None, target_edge=None):
+        """Gets the paths units would take if structures were placed at the given locations.
+        The game map is not modified, and only the parts of the distance fields affected by
+        the hypothetical structures are recomputed, so this is cheap to call for many candidates.
+
+        Args:
+            locations: A location or list of locations to treat as blocked
+            start_locations: The locations of hypothetical units. Every enemy spawn location if None.
+            target_edge: The edge the units want to reach. Induced from each start location if None.
+
+        Returns:
+            A dict mapping each start location (as an (x, y) tuple) to the path a unit there would take,
+            or None if the start location would be blocked
+
+        """
+        return self.__what_if(locations, [], start_locations, target_edge)
+
+    def what_if_unblock(self, locations, start_locations=None, target_edge=None):
+        """Gets the paths units would take if the structures at the given locations were removed.
+        See what_if_block.
+
+        Args:
+            locations: A location or list of locations to treat as empty
+            start_locations: The locations of hypothetical units. Every enemy spawn location if None.
+            target_edge: The edge the units want to reach. Induced from each start location if None.
+
+        Returns:
+            A dict mapping each start location (as an (x, y) tuple) to the path a unit there would take
+
+        """
+        return self.__what_if([], locations, start_locations, target_edge)
+
+    def __what_if(self, block_locations, unblock_locations, start_locations, target_edge):
+        if block_locations and type(block_locations[0]) == int:
+            block_locations = [block_locations]
+        if unblock_locations and type(unblock_locations[0]) == int:
+            unblock_locations = [unblock_locations]
+        if target_edge is not None and self.game_map.get_edge_locations(target_edge) is None:
+            return
+        if start_locations is None:
+            start_locations = self.game_map.get_edge_locations(self.game_map.TOP_LEFT) + self.game_map.get_edge_locations(self.game_map.TOP_RIGHT)
+
+        target_edges = [self.get_target_edge(location) if target_edge is None else target_edge for location in start_locations]
+        paths = self._shortest_path_finder.navigate_what_if(start_locations, target_edges, self, block_locations, unblock_locations)
+        return {tuple(location): path for location, path in zip(start_locations, paths)}
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -614,6 +810,55 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets_batch(self, attackers=None):
+        """Finds the target of many attacking units at once, using the same priority as get_target.
+        The units on the board are indexed by tile and their sort keys are computed once, so each
+        attacker only compares the units in its range.
+
+        Args:
+            attackers: A list of GameUnits, defaults to every unit on the board that deals damage
+
+        Returns:
+            A list of (attacker, target) pairs in the order of attackers, where target is the GameUnit
+            get_target would return, or None
+
+        """
+        occupied = self.game_map.get_unit_locations()
+        if attackers is None:
+            attackers = [unit for x, y in occupied for unit in self.game_map[x, y] if unit.damage_i + unit.damage_f > 0]
+
+        # Everything except distance, ordered so that the lowest key wins. The y component is flipped for player 1's attackers
+        keys = {}
+        for x, y in occupied:
+            for unit in self.game_map[x, y]:
+                keys[id(unit)] = (unit.stationary, unit.health, unit.y, -abs(self.HALF_ARENA - 0.5 - unit.x))
+
+        results = []
+        for attacker in attackers:
+            if not isinstance(attacker, GameUnit) or not self.game_map.in_arena_bounds([attacker.x, attacker.y]):
+                results.append((attacker, self.get_target(attacker)))
+                continue
+            target = None
+            target_key = None
+            flip = 1 if attacker.player_index == 0 else -1
+            for x, y in self.game_map.iter_locations_in_range([attacker.x, attacker.y], attacker.attackRange):
+                units = self.game_map[x, y]
+                if not units:
+                    continue
+                distance = None
+                for unit in units:
+                    if unit.player_index == attacker.player_index or (attacker.damage_f == 0 and unit.stationary) or (attacker.damage_i == 0 and not unit.stationary):
+                        continue
+                    if distance is None:
+                        distance = math.sqrt((x - attacker.x)**2 + (y - attacker.y)**2)
+                    stationary, health, unit_y, x_distance = keys[id(unit)]
+                    key = (stationary, distance, health, flip * unit_y, x_distance)
+                    if target_key is None or key < target_key:
+                        target = unit
+                        target_key = key
+            results.append((attacker, target))
+        return results
+
     def get_attackers(self, location, player_index):
         """Gets the stationary units threatening a given location
 
@@ -632,16 +877,121 @@ class GameState:
             self.warn("Location {} is not in the arena bounds.".format(location))
 
         attackers = []
-        """
-        Get locations in the range of TURRET units
-        """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
-            for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+        x, y = location
+        # Only tiles within the longest attackRange of any unit type can hold an attacker. The tiles
+        # are read from the map itself, so units appended straight to game_map[x, y] are found too
+        for unit_x, unit_y in get_range_stencil(self._max_attack_range, 0, True).locations(int(x), int(y)):
+            distance = math.sqrt((x - unit_x) ** 2 + (y - unit_y) ** 2)
+            for unit in self.game_map[unit_x, unit_y]:
+                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and distance <= unit.attackRange:
                     attackers.append(unit)
         return attackers
+
+    def get_attackers_batch(self, locations, player_index, counts=False):
+        """Gets the stationary units threatening each of many locations, such as every tile of a path.
+        Each attacker is visited once and added to every requested location in its range,
+        instead of scanning the area around every location.
+
+        Args:
+            locations: A list of locations of a hypothetical defender
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+            counts: If True, return the number of attackers instead of the attackers themselves
+
+        Returns:
+            A list aligned with locations. Each entry is the list get_attackers would return for that
+            location, in the same order, or its length if counts is True.
+
+        Attackers are found through the map's unit type index, so a unit appended straight to
+        game_map[x, y] instead of placed with add_unit is missed here, while get_attackers finds it.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+
+        keys = [int(location[0]) * self.ARENA_SIZE + int(location[1]) if self.game_map.in_arena_bounds(location) else None for location in locations]
+        requested = {key: [] for key in keys if key is not None}
+
+        # Tiles are visited in x major order, the order get_attackers finds attackers around a location
+        for index in self.game_map._get_sorted_tiles(1 - player_index, self._attacker_types):
+            for unit in self.game_map[index // self.ARENA_SIZE, index % self.ARENA_SIZE]:
+                if unit.damage_i + unit.damage_f <= 0 or unit.player_index == player_index:
+                    continue
+                for x, y in get_range_stencil(unit.attackRange, 0, True).locations(unit.x, unit.y):
+                    attackers = requested.get(x * self.ARENA_SIZE + y)
+                    if attackers is not None:
+                        attackers.append(unit)
+
+        results = []
+        for key, location in zip(keys, locations):
+            attackers = requested[key] if key is not None else self.get_attackers(location, player_index)
+            results.append(len(attackers) if counts else list(attackers))
+        return results
+
+
+class Speculation:
+    """Records the changes made to a GameState so they can be undone. Created by GameState.speculate.
+
+    Changes are kept in an undo log shared by every speculation on the GameState, so rolling back
+    costs one step per change made since the point being rolled back to.
+
+    Attributes :
+        * game_state (GameState): The GameState being changed
+        * committed (bool): Whether the changes will be kept when the with block ends
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.committed = False
+        self._outermost = False
+        self._start = None
+
+    def __enter__(self):
+        if self.game_state._undo_log is None:
+            self.game_state._undo_log = []
+            self._outermost = True
+        self._start = self.savepoint()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None or not self.committed:
+            self.rollback(self._start)
+        if self._outermost:
+            self.game_state._undo_log = None
+        return False
+
+    def savepoint(self):
+        """Marks the current state so it can be rolled back to later
+
+        Returns:
+            A savepoint to pass to rollback
+
+        """
+        game_state = self.game_state
+        return (len(game_state._undo_log), len(game_state._build_stack), len(game_state._deploy_stack))
+
+    def rollback(self, savepoint=None):
+        """Undoes every change made since a savepoint
+
+        Args:
+            savepoint: A savepoint from this speculation, defaults to where the speculation started
+
+        """
+        game_state = self.game_state
+        log_length, build_length, deploy_length = self._start if savepoint is None else savepoint
+        undo_log = game_state._undo_log
+        while len(undo_log) > log_length:
+            entry = undo_log.pop()
+            if entry[0] == "resource":
+                _, player_index, resource_key, amount = entry
+                game_state._player_resources[player_index][resource_key] = amount
+            else:
+                _, x, y, units = entry
+                game_state.game_map[x, y] = units
+        del game_state._build_stack[build_length:]
+        del game_state._deploy_stack[deploy_length:]
+
+    def commit(self):
+        """Keeps the changes made in this speculation when its with block ends.
+        An outer speculation that is rolled back still undoes them.
+        """
+        self.committed = True
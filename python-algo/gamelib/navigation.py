@@ -1,24 +1,361 @@
 import heapq
-import math
 import sys
-import queue
+from collections import deque, OrderedDict
 from .util import debug_write
+from .game_map import ARENA_SIZE, HALF_ARENA, NUM_TILES, IN_BOUNDS, VALID_INDICES, EDGE_LOCATIONS, EDGE_INDICES
 
-class Node:
-    """A path-finding node
+
+def _build_neighbors(mask):
+    """Builds, for every tile index, the in bounds neighbor indices in the order up, down, right, left.
+    This is the same order the original node based search visited neighbors in.
+    """
+    neighbors = []
+    for index in range(NUM_TILES):
+        x, y = divmod(index, ARENA_SIZE)
+        candidates = []
+        if mask[index]:
+            if y + 1 < ARENA_SIZE:
+                candidates.append(index + 1)
+            if y - 1 >= 0:
+                candidates.append(index - 1)
+            if x + 1 < ARENA_SIZE:
+                candidates.append(index + ARENA_SIZE)
+            if x - 1 >= 0:
+                candidates.append(index - ARENA_SIZE)
+        neighbors.append(tuple(n for n in candidates if mask[n]))
+    return neighbors
+
+
+NEIGHBORS = _build_neighbors(IN_BOUNDS)
+
+
+class DistanceFieldCache:
+    """Caches the distance fields used for pathing on a single board state.
+
+    When the pocket of pathable space around a unit touches its target edge, the
+    distance field only depends on the blocked tiles and the target edge, so at most
+    one field per edge is computed and it is shared by every start location.
+    Units in pockets that cannot reach their edge path to the most ideal self destruct
+    tile of their pocket instead, and get a field shared by every start in that pocket.
 
     Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+        * blocked (list): blocked[x * ARENA_SIZE + y] is True if there is a structure at [x, y]
+        * searches (int): The number of breadth first searches run to build fields so far
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    def __init__(self, blocked):
+        self.blocked = blocked
+        self.searches = 0
+        self._pocket_labels = None
+        self._pocket_tiles = []
+        self._pocket_edges = []
+        self._edge_fields = {}
+        self._pocket_fields = {}
+        self._policies = {}
+
+    def get_pocket(self, index):
+        """Gets the label of the pocket of pathable space containing a tile
+
+        Args:
+            index: The tile index, x * ARENA_SIZE + y
+
+        Returns:
+            An integer shared by all tiles reachable from this tile, or -1 if the tile is blocked
+
+        """
+        if self._pocket_labels is None:
+            self._label_pockets()
+        return self._pocket_labels[index]
+
+    def _label_pockets(self):
+        """Flood fills the board once, labelling every connected region of unblocked tiles
+        """
+        blocked = self.blocked
+        labels = [-1] * NUM_TILES
+        for index in VALID_INDICES:
+            if blocked[index] or not labels[index] == -1:
+                continue
+            label = len(self._pocket_tiles)
+            labels[index] = label
+            tiles = [index]
+            current = deque(tiles)
+            while current:
+                for neighbor in NEIGHBORS[current.popleft()]:
+                    if blocked[neighbor] or not labels[neighbor] == -1:
+                        continue
+                    labels[neighbor] = label
+                    tiles.append(neighbor)
+                    current.append(neighbor)
+            self._pocket_tiles.append(tiles)
+            self._pocket_edges.append(set())
+
+        for edge, indices in enumerate(EDGE_INDICES):
+            for index in indices:
+                if not labels[index] == -1:
+                    self._pocket_edges[labels[index]].add(edge)
+        self._pocket_labels = labels
+
+    def get_field(self, start, target_edge):
+        """Gets the distance field a unit starting at a tile would follow
+
+        Args:
+            start: The unblocked tile index the unit starts on, x * ARENA_SIZE + y
+            target_edge: The edge the unit wants to reach, an index into EDGE_LOCATIONS
+
+        Returns:
+            A list where field[x * ARENA_SIZE + y] is the distance to the unit's target. Must not be modified.
+
+        """
+        return self._get_field(start, target_edge)[1]
+
+    def get_policy(self, start, target_edge):
+        """Gets the PathPolicy for the distance field a unit starting at a tile would follow.
+        Policies are cached, so every start sharing a field also shares its next step table.
+
+        Args:
+            start: The unblocked tile index the unit starts on, x * ARENA_SIZE + y
+            target_edge: The edge the unit wants to reach, an index into EDGE_LOCATIONS
+
+        Returns:
+            A PathPolicy that can be queried for any start location following the same field
+
+        """
+        key, field = self._get_field(start, target_edge)
+        policy = self._policies.get(key)
+        if policy is None:
+            policy = PathPolicy(field, self.blocked, target_edge)
+            self._policies[key] = policy
+        return policy
+
+    def _get_field(self, start, target_edge):
+        """Gets the cache key and distance field for a start tile and target edge
+        """
+        pocket = self.get_pocket(start)
+        if target_edge in self._pocket_edges[pocket]:
+            field = self._edge_fields.get(target_edge)
+            if field is None:
+                field = self._search(EDGE_INDICES[target_edge])
+                self._edge_fields[target_edge] = field
+            return target_edge, field
+
+        key = (pocket, target_edge)
+        field = self._pocket_fields.get(key)
+        if field is None:
+            field = self._search([self._most_ideal(pocket, target_edge)])
+            self._pocket_fields[key] = field
+        return key, field
+
+    def _most_ideal(self, pocket, target_edge):
+        """Finds the best self destruct tile of a pocket that does not touch the target edge
+        """
+        x, y = EDGE_LOCATIONS[target_edge][0]
+        flip_x = x < HALF_ARENA
+        flip_y = y < HALF_ARENA
+        best_idealness = -1
+        most_ideal = None
+        for index in self._pocket_tiles[pocket]:
+            x, y = divmod(index, ARENA_SIZE)
+            idealness = 28 * ((27 - y) if flip_y else y) + ((27 - x) if flip_x else x)
+            if idealness > best_idealness:
+                best_idealness = idealness
+                most_ideal = index
+        return most_ideal
+
+    def _search(self, sources):
+        """Breadth first search from a set of source tiles. Blocked sources are given a
+        pathlength of 0 but are not expanded, matching ShortestPathFinder._validate
+        """
+        self.searches += 1
+        blocked = self.blocked
+        field = [-1] * NUM_TILES
+        current = deque()
+        for index in sources:
+            field[index] = 0
+            if not blocked[index]:
+                current.append(index)
+        while current:
+            current_location = current.popleft()
+            next_pathlength = field[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or not field[neighbor] == -1:
+                    continue
+                field[neighbor] = next_pathlength
+                current.append(neighbor)
+        return field
+
+
+class DynamicDistanceField:
+    """A distance field to one edge that is repaired in place after single tile updates.
+
+    Blocking a tile only recomputes the tiles whose every shortest route went through it,
+    and unblocking a tile only spreads the distances it shortens, so asking how paths change
+    for one hypothetical structure does not need a search of the whole board.
+    The field follows the same rules as DistanceFieldCache edge fields: edge tiles are always 0,
+    blocked edge tiles are not expanded, and unreachable tiles are -1.
+
+    Attributes :
+        * blocked (list): blocked[x * ARENA_SIZE + y] is True if there is a structure at [x, y]. Owned by this field.
+        * field (list): field[x * ARENA_SIZE + y] is the distance to the target edge, -1 if unreachable
+        * target_edge (int): The edge this field leads to, an index into EDGE_LOCATIONS
+        * changed (int): The number of tiles whose distance changed during the last update
+
+    """
+    def __init__(self, blocked, target_edge):
+        self.blocked = list(blocked)
+        self.target_edge = target_edge
+        self.changed = 0
+        self._sources = set(EDGE_INDICES[target_edge])
+        self.field = DistanceFieldCache(self.blocked)._search(EDGE_INDICES[target_edge])
+
+    def block(self, index):
+        """Adds a structure to a tile and repairs the distances that depended on it
+
+        Args:
+            index: The tile index, x * ARENA_SIZE + y
+
+        """
+        blocked = self.blocked
+        field = self.field
+        self.changed = 0
+        if blocked[index]:
+            return
+        blocked[index] = True
+        old_pathlength = field[index]
+        if old_pathlength == -1:
+            return
+        if index not in self._sources:
+            field[index] = -1
+            self.changed += 1
+
+        # Find every tile that no longer has an unaffected neighbor one step closer to the edge.
+        # Candidates are visited in order of distance, so their parents are always decided first
+        affected = set()
+        current = deque(n for n in NEIGHBORS[index] if field[n] == old_pathlength + 1)
+        while current:
+            location = current.popleft()
+            if location in affected or location in self._sources:
+                continue
+            parent_pathlength = field[location] - 1
+            for neighbor in NEIGHBORS[location]:
+                if field[neighbor] == parent_pathlength and not blocked[neighbor] and neighbor not in affected:
+                    break
+            else:
+                affected.add(location)
+                for neighbor in NEIGHBORS[location]:
+                    if field[neighbor] == parent_pathlength + 2:
+                        current.append(neighbor)
+
+        # Reset the affected tiles and refill them from their unaffected boundary
+        for location in affected:
+            field[location] = -1
+        frontier = []
+        for location in affected:
+            best = -1
+            for neighbor in NEIGHBORS[location]:
+                if not blocked[neighbor] and field[neighbor] >= 0 and (best == -1 or field[neighbor] + 1 < best):
+                    best = field[neighbor] + 1
+            if not best == -1:
+                heapq.heappush(frontier, (best, location))
+        while frontier:
+            pathlength, location = heapq.heappop(frontier)
+            if not field[location] == -1:
+                continue
+            field[location] = pathlength
+            for neighbor in NEIGHBORS[location]:
+                if neighbor in affected and field[neighbor] == -1:
+                    heapq.heappush(frontier, (pathlength + 1, neighbor))
+        self.changed += len(affected)
+
+    def unblock(self, index):
+        """Removes a structure from a tile and spreads any distances it shortens
+
+        Args:
+            index: The tile index, x * ARENA_SIZE + y
+
+        """
+        blocked = self.blocked
+        field = self.field
+        self.changed = 0
+        if not blocked[index]:
+            return
+        blocked[index] = False
+        if index not in self._sources:
+            best = -1
+            for neighbor in NEIGHBORS[index]:
+                if not blocked[neighbor] and field[neighbor] >= 0 and (best == -1 or field[neighbor] + 1 < best):
+                    best = field[neighbor] + 1
+            field[index] = best
+            if best == -1:
+                return
+            self.changed += 1
+
+        current = deque((index,))
+        while current:
+            location = current.popleft()
+            next_pathlength = field[location] + 1
+            for neighbor in NEIGHBORS[location]:
+                if blocked[neighbor] or neighbor in self._sources:
+                    continue
+                if field[neighbor] == -1 or field[neighbor] > next_pathlength:
+                    field[neighbor] = next_pathlength
+                    self.changed += 1
+                    current.append(neighbor)
+
+
+class PathCache:
+    """A bounded least recently used cache of paths.
+
+    Entries are keyed by (blocked bitboard, start tile index, target edge). A path only depends on
+    where structures are, so entries stay valid across turns and across GameState objects. Because
+    the key is the whole bitboard, building or losing any structure misses every entry made for the
+    old board, so hits come from repeating questions on a board that has not changed, such as
+    helpers asking for the same paths within a turn or a layout that survives a turn untouched.
+
+    Attributes :
+        * maxsize (int): The maximum number of paths kept before the least recently used is evicted
+        * hits (int): The number of lookups that found a path
+        * misses (int): The number of lookups that did not find a path
+
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Looks up a path, marking it as recently used
+
+        Returns:
+            The cached path as a tuple of (x, y) tuples, or None
+
+        """
+        path = self._entries.get(key)
+        if path is None:
+            self.misses += 1
+            return
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def put(self, key, path):
+        """Stores a path, evicting the least recently used paths if the cache is full
+        """
+        self._entries[key] = path
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes every path and resets the hit and miss counters
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +365,52 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles path-finding
 
+    The board is stored in flat lists indexed by x * ARENA_SIZE + y, which are
+    allocated once per search instead of one object per tile.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (list): blocked[x * ARENA_SIZE + y] is True if there is a structure at [x, y]
+        * pathlength (list): pathlength[x * ARENA_SIZE + y] is the distance between [x, y] and the target location, -1 if unreached
+        * path_cache (:obj: PathCache): A path cache shared by every ShortestPathFinder, None unless enable_path_cache was called
 
     """
+    path_cache = None
+
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self._field_cache = None
+        self._field_cache_key = None
+        self._dynamic_fields = {}
+
+    @classmethod
+    def enable_path_cache(cls, maxsize=4096):
+        """Turns on the path cache shared by every ShortestPathFinder, which is used by
+        navigate_to_edge and navigate_batch. Since it is shared, it keeps working across
+        the new GameState built every turn.
+
+        Args:
+            maxsize: The maximum number of paths to keep
+
+        Returns:
+            The PathCache, which can be inspected for its hits and misses
+
+        """
+        if cls.path_cache is None:
+            cls.path_cache = PathCache(maxsize)
+        cls.path_cache.maxsize = maxsize
+        return cls.path_cache
+
+    @classmethod
+    def disable_path_cache(cls):
+        """Turns off and discards the shared path cache
+        """
+        cls.path_cache = None
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +418,11 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
+        #Initialize map
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        self.blocked = [False] * NUM_TILES
+        self.pathlength = [-1] * NUM_TILES
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -65,48 +437,202 @@ class ShortestPathFinder:
             Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
 
         """
-        if game_state.contains_stationary_unit(start_point):
+        if game_state.contains_stationary_unit(start_point) or not game_state.game_map.in_arena_bounds(start_point):
             return
 
-        #Initialize map 
+        #Initialize map
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self.blocked = self._get_blocked(game_state)
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
+        start = start_point[0] * ARENA_SIZE + start_point[1]
+        ideal_endpoint = self._idealness_search(start, end_points)
+        self._validate(ideal_endpoint, end_points)
         return self._get_path(start_point, end_points)
 
+    def navigate_to_edge(self, start_point, target_edge, game_state):
+        """Finds the path a unit would take to reach one of the four edges
+
+        Unlike navigate_multiple_endpoints, the distance fields are cached per board state
+        and shared between every start location, so pathing from many locations only
+        searches the board a handful of times.
+
+        Args:
+            * start_point: The starting location of the unit
+            * target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+            * game_state: The current game state
+
+        Returns:
+            The path a unit at start_point would take when trying to reach target_edge given the current game state.
+
+        """
+        if game_state.contains_stationary_unit(start_point) or not game_state.game_map.in_arena_bounds(start_point):
+            return
+
+        self.initialized = True
+        self.game_state = game_state
+        return self._find_path(start_point, target_edge, game_state)
+
+    def navigate_batch(self, start_points, target_edges, game_state):
+        """Finds the paths many units would take, sharing one DistanceFieldCache between all of them
+
+        Args:
+            * start_points: The starting locations of the units
+            * target_edges: The edge each unit wants to reach, in the same order as start_points
+            * game_state: The current game state
+
+        Returns:
+            A list with the path for each start point, or None for start points that are blocked or out of bounds
+
+        """
+        bits = game_state.game_map.get_structure_bitboard()
+        self.initialized = True
+        self.game_state = game_state
+
+        paths = []
+        for start_point, target_edge in zip(start_points, target_edges):
+            if not game_state.game_map.in_arena_bounds(start_point) or (bits >> (start_point[0] * ARENA_SIZE + start_point[1])) & 1:
+                paths.append(None)
+                continue
+            paths.append(self._find_path(start_point, target_edge, game_state))
+        return paths
+
+    def _find_path(self, start_point, target_edge, game_state):
+        """Reads the path from an unblocked start point through its PathPolicy,
+        checking the shared path cache first when it is enabled
+        """
+        start = start_point[0] * ARENA_SIZE + start_point[1]
+        path_cache = ShortestPathFinder.path_cache
+        if path_cache is not None:
+            key = (game_state.game_map.get_structure_bitboard(), start, target_edge)
+            cached = path_cache.get(key)
+            if cached is not None:
+                return [start_point] + [list(location) for location in cached[1:]]
+
+        cache = self.get_distance_field_cache(game_state)
+        policy = cache.get_policy(start, target_edge)
+        self.blocked = cache.blocked
+        self.pathlength = policy.field
+        path = policy.get_path(start_point)
+        if path_cache is not None:
+            path_cache.put(key, tuple(tuple(location) for location in path))
+        return path
+
+    def get_distance_field_cache(self, game_state):
+        """Gets the DistanceFieldCache for the current board, building a new one if the structure bitboard has changed
+
+        Args:
+            game_state: The current game state
+
+        Returns:
+            A DistanceFieldCache for the structures currently on game_state.game_map
+
+        """
+        key = game_state.game_map.get_structure_bitboard()
+        if self._field_cache is None or not self._field_cache_key == key:
+            self._field_cache = DistanceFieldCache(self._get_blocked(game_state))
+            self._field_cache_key = key
+            self._dynamic_fields = {}
+        return self._field_cache
+
+    def navigate_what_if(self, start_points, target_edges, game_state, block_locations=(), unblock_locations=()):
+        """Finds the paths units would take if structures were added to or removed from some locations.
+        The game map is not modified. Each target edge keeps a DynamicDistanceField that is
+        repaired for the hypothetical change and then restored, instead of searching the whole board.
+
+        Args:
+            * start_points: The starting locations of the units
+            * target_edges: The edge each unit wants to reach, in the same order as start_points
+            * game_state: The current game state
+            * block_locations: Locations treated as if a structure was placed there
+            * unblock_locations: Locations treated as if their structure was removed
+
+        Returns:
+            A list with the path for each start point, or None for start points that would be blocked or are out of bounds
+
+        """
+        cache = self.get_distance_field_cache(game_state)
+        edges = set(target_edges)
+        for edge in edges:
+            if edge not in self._dynamic_fields:
+                self._dynamic_fields[edge] = DynamicDistanceField(cache.blocked, edge)
+        dynamic_fields = [self._dynamic_fields[edge] for edge in edges]
+
+        # Apply the hypothetical changes, remembering which ones actually changed a tile
+        updates = []
+        for location, block in [(location, True) for location in block_locations] + [(location, False) for location in unblock_locations]:
+            if not game_state.game_map.in_arena_bounds(location):
+                continue
+            index = location[0] * ARENA_SIZE + location[1]
+            if dynamic_fields and dynamic_fields[0].blocked[index] == block:
+                continue
+            updates.append((index, block))
+            for dynamic_field in dynamic_fields:
+                if block:
+                    dynamic_field.block(index)
+                else:
+                    dynamic_field.unblock(index)
+
+        paths = []
+        trapped_cache = None
+        for start_point, target_edge in zip(start_points, target_edges):
+            dynamic_field = self._dynamic_fields[target_edge]
+            start = start_point[0] * ARENA_SIZE + start_point[1]
+            if not game_state.game_map.in_arena_bounds(start_point) or dynamic_field.blocked[start]:
+                paths.append(None)
+                continue
+            if dynamic_field.field[start] >= 0:
+                self.blocked = dynamic_field.blocked
+                self.pathlength = dynamic_field.field
+                paths.append(self._get_path(start_point, EDGE_LOCATIONS[target_edge]))
+                continue
+            # The unit is cut off from its edge, so it follows the field of its self destruct pocket
+            if trapped_cache is None:
+                trapped_cache = DistanceFieldCache(list(dynamic_field.blocked))
+            paths.append(trapped_cache.get_policy(start, target_edge).get_path(start_point))
+
+        # Undo the changes so the fields match the real board again
+        for index, block in reversed(updates):
+            for dynamic_field in dynamic_fields:
+                if block:
+                    dynamic_field.unblock(index)
+                else:
+                    dynamic_field.block(index)
+        self.blocked = cache.blocked
+        return paths
+
+    def _get_blocked(self, game_state):
+        """Builds the blocked list for the structures on the board
+        """
+        return game_state.game_map._get_blocked()
+
     def _idealness_search(self, start, end_points):
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
+        Finds the most ideal tile in our 'pocket' of pathable space.
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        blocked = self.blocked
+        end_indices = set(x * ARENA_SIZE + y for x, y in end_points)
+        direction = self._get_direction_from_endpoints(end_points)
+        visited = [False] * NUM_TILES
+        visited[start] = True
+        current = deque((start,))
+        best_idealness = self._get_idealness(start, end_indices, direction)
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            search_location = current.popleft()
+            for neighbor in NEIGHBORS[search_location]:
+                if blocked[neighbor] or visited[neighbor]:
                     continue
+                visited[neighbor] = True
+                current.append(neighbor)
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
-
+                current_idealness = self._get_idealness(neighbor, end_indices, direction)
                 if current_idealness > best_idealness:
                     best_idealness = current_idealness
                     most_ideal = neighbor
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
-
         return most_ideal
 
     def _get_neighbors(self, location):
@@ -119,7 +645,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -128,33 +654,32 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
         return direction
 
-    def _get_idealness(self, location, end_points):
+    def _get_idealness(self, index, end_indices, direction):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
             A location the unit will attempt to reach
         """
-        if location in end_points:
+        if index in end_indices:
             return sys.maxsize
 
-        direction = self._get_direction_from_endpoints(end_points)
-
+        x, y = divmod(index, ARENA_SIZE)
         idealness = 0
         if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
+            idealness += 28 * y
+        else:
+            idealness += 28 * (27 - y)
         if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
+            idealness += x
+        else:
+            idealness += (27 - x)
 
         return idealness
 
@@ -164,31 +689,30 @@ class ShortestPathFinder:
         """
         #VALIDATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+        blocked = self.blocked
+        pathlength = self.pathlength
+        current = deque()
+        end_indices = [x * ARENA_SIZE + y for x, y in end_points]
+        if ideal_tile in end_indices:
+            for index in end_indices:
+                current.append(index)
+                #Set current pathlength to 0
+                pathlength[index] = 0
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            current.append(ideal_tile)
+            pathlength[ideal_tile] = 0
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            current_location = current.popleft()
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or not pathlength[neighbor] == -1:
                     continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
@@ -199,92 +723,84 @@ class ShortestPathFinder:
 
         """
         #GET THE PATH
+        pathlength = self.pathlength
+        direction = self._get_direction_from_endpoints(end_points)
         path = [start_point]
-        current = start_point
+        current = start_point[0] * ARENA_SIZE + start_point[1]
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, direction)
 
-            if current[0] == next_move[0]:
+            if current // ARENA_SIZE == next_move // ARENA_SIZE:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append(list(divmod(next_move, ARENA_SIZE)))
             current = next_move
-        
+
         #debug_write(path)
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        blocked = self.blocked
+        pathlength = self.pathlength
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point]
+        for neighbor in NEIGHBORS[current_point]:
+            if blocked[neighbor]:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor]
 
-            #Filter by pathlength
+            #Filter by pathlength, then by direction based on prev move
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
-            #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            elif current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
+        prev_x, prev_y = divmod(prev_tile, ARENA_SIZE)
+        new_x, new_y = divmod(new_tile, ARENA_SIZE)
+        best_x, best_y = divmod(prev_best, ARENA_SIZE)
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
+            if prev_y == new_y:
+                return False
             return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            if prev_x == new_x:
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_y == new_y:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
+
+        #To make it here, both moves are on the same axis
+        if new_y == best_y: #If they both moved horizontal...
+            if direction[0] == 1 and new_x > best_x: #If we moved right and right is our direction, we moved towards our direction
+                return True
+            if direction[0] == -1 and new_x < best_x: #If we moved left and left is our direction, we moved towards our direction
+                return True
+            return False
+        if new_x == best_x: #If they both moved vertical...
+            if direction[1] == 1 and new_y > best_y: #If we moved up and up is our direction, we moved towards our direction
                 return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
+            if direction[1] == -1 and new_y < best_y: #If we moved down and down is our direction, we moved towards our direction
                 return True
             return False
         return True
@@ -299,9 +815,9 @@ class ShortestPathFinder:
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = x * ARENA_SIZE + (28 - y - 1)
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -314,3 +830,94 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class PathPolicy:
+    """A next step lookup table for one distance field, so reading a path is a table walk.
+
+    Units choose their next tile from the distance field and the direction of their previous move,
+    so the table is keyed by (tile, previous move direction). Entries are filled in the first time
+    they are needed, or all at once by precompute(). A policy never changes once built, so it can be
+    kept and queried as many times as needed while the board it was built for stays the same.
+
+    Attributes :
+        * field (list): field[x * ARENA_SIZE + y] is the distance to the target, -1 if unreachable
+        * blocked (list): blocked[x * ARENA_SIZE + y] is True if there is a structure at [x, y]
+        * target_edge (int): The edge units following this policy want to reach
+
+    """
+    def __init__(self, field, blocked, target_edge):
+        self.field = field
+        self.blocked = blocked
+        self.target_edge = target_edge
+        self._finder = ShortestPathFinder()
+        self._finder.blocked = blocked
+        self._finder.pathlength = field
+        self._direction = self._finder._get_direction_from_endpoints(EDGE_LOCATIONS[target_edge])
+        # _table[index * 3 + previous_move_direction] = next_index * 3 + move_direction
+        self._table = [None] * (NUM_TILES * 3)
+
+    def next_step(self, index, previous_move_direction):
+        """Gets the tile a unit moves to next
+
+        Args:
+            index: The tile index the unit is on, x * ARENA_SIZE + y
+            previous_move_direction: The direction of the unit's previous move, 0 if it has not moved yet, otherwise ShortestPathFinder.HORIZONTAL or VERTICAL
+
+        Returns:
+            A (next_index, move_direction) tuple
+
+        """
+        return divmod(self._step(index * 3 + previous_move_direction), 3)
+
+    def _step(self, key):
+        step = self._table[key]
+        if step is None:
+            finder = self._finder
+            index, previous_move_direction = divmod(key, 3)
+            next_move = finder._choose_next_move(index, previous_move_direction, self._direction)
+            if index // ARENA_SIZE == next_move // ARENA_SIZE:
+                step = next_move * 3 + finder.VERTICAL
+            else:
+                step = next_move * 3 + finder.HORIZONTAL
+            self._table[key] = step
+        return step
+
+    def precompute(self):
+        """Fills in the next step for every reachable tile and previous move direction
+
+        Returns:
+            This policy, so it can be chained with construction
+
+        """
+        field = self.field
+        blocked = self.blocked
+        for index in VALID_INDICES:
+            if field[index] > 0 and not blocked[index]:
+                for previous_move_direction in range(3):
+                    self._step(index * 3 + previous_move_direction)
+        return self
+
+    def get_path(self, start_point):
+        """Gets the path a unit at a location would take by walking the table
+
+        Args:
+            start_point: The starting location of the unit
+
+        Returns:
+            The path as a list of locations, or None if the start location does not follow this policy's field
+
+        """
+        field = self.field
+        table = self._table
+        start = start_point[0] * ARENA_SIZE + start_point[1]
+        if field[start] < 0 or self.blocked[start]:
+            return
+
+        path = [start_point]
+        key = start * 3
+        while not field[key // 3] == 0:
+            step = table[key]
+            key = self._step(key) if step is None else step
+            path.append(list(divmod(key // 3, ARENA_SIZE)))
+        return path
@@ -0,0 +1,972 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .game_map import ARENA_SIZE, HALF_ARENA, NUM_TILES, IN_BOUNDS, EDGE_SETS, EDGE_INDICES, GameMap, get_range_stencil
+from .navigation import DistanceFieldCache
+from .unit import GameUnit
+from .threat_map import ThreatMap
+
+# Per tile lookups used while targeting
+TILE_X = [index // ARENA_SIZE for index in range(NUM_TILES)]
+TILE_Y = [index % ARENA_SIZE for index in range(NUM_TILES)]
+TILE_X_DISTANCE = [-abs(HALF_ARENA - 0.5 - x) for x in TILE_X]
+# _DISTANCE[abs(dx) * ARENA_SIZE + abs(dy)] is the length of the offset (dx, dy)
+_DISTANCE = [math.sqrt(dx ** 2 + dy ** 2) for dx in range(ARENA_SIZE) for dy in range(ARENA_SIZE)]
+
+_RANGE_TILES = {}
+_RANGE_MASKS = {}
+_RANGE_ARRAYS = {}
+
+
+def _range_tiles(radius, hit_radius, inclusive=False):
+    """Gets, for every center tile, the (index, distance) pairs of the in bounds tiles in range,
+    in the order get_locations_in_range returns them
+    """
+    key = (radius, hit_radius, inclusive)
+    tiles = _RANGE_TILES.get(key)
+    if tiles is None:
+        offsets = get_range_stencil(radius, hit_radius, inclusive).offsets
+        tiles = [None] * NUM_TILES
+        for center in range(NUM_TILES):
+            if not IN_BOUNDS[center]:
+                continue
+            x, y = divmod(center, ARENA_SIZE)
+            tiles[center] = tuple(((x + dx) * ARENA_SIZE + y + dy, distance) for dx, dy, distance in offsets
+                                  if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE and IN_BOUNDS[(x + dx) * ARENA_SIZE + y + dy])
+        _RANGE_TILES[key] = tiles
+    return tiles
+
+
+def _range_masks(radius, hit_radius, inclusive=False):
+    """Gets, for every center tile, a bitboard of the in bounds tiles in range.
+    Walking the set bits from lowest to highest visits tiles in the same order as _range_tiles.
+    """
+    key = (radius, hit_radius, inclusive)
+    masks = _RANGE_MASKS.get(key)
+    if masks is None:
+        masks = [0 if tiles is None else sum(1 << index for index, _ in tiles) for tiles in _range_tiles(radius, hit_radius, inclusive)]
+        _RANGE_MASKS[key] = masks
+    return masks
+
+
+def _range_array(ranges):
+    """Gets a table from _range_tiles or _range_masks as a NumPy array, where array[center, index] is True
+    if index is in range of center
+    """
+    cached = _RANGE_ARRAYS.get(id(ranges))
+    if cached is None:
+        array = np.zeros((NUM_TILES, NUM_TILES), dtype=bool)
+        for center, tiles in enumerate(ranges):
+            if not tiles:
+                continue
+            if isinstance(tiles, int):
+                bits = np.frombuffer(tiles.to_bytes((NUM_TILES + 7) // 8, "little"), dtype=np.uint8)
+                array[center] = np.unpackbits(bits, bitorder="little")[:NUM_TILES]
+            else:
+                array[center, [index for index, _ in tiles]] = True
+        # The tables are never freed, so their ids stay unique
+        cached = (ranges, array)
+        _RANGE_ARRAYS[id(ranges)] = cached
+    return cached[1]
+
+
+class AttackEstimate:
+    """A quick estimate of how a group of mobile units would fare, from estimate_attack.
+
+    Attributes :
+        * path (list): The path the group would take
+        * frames (float): The number of frames the group would need to walk the path
+        * damage_taken (float): The total damage enemy structures would deal to the group along the path
+        * survivors (int): The number of units expected to reach the end of the path
+        * reaches_edge (bool): Whether the path ends on the group's target edge
+        * breach_damage (float): The health the group would take from the opponent, 0 if it does not reach its edge
+
+    """
+    def __init__(self, path, frames, damage_taken, survivors, reaches_edge, breach_damage):
+        self.path = path
+        self.frames = frames
+        self.damage_taken = damage_taken
+        self.survivors = survivors
+        self.reaches_edge = reaches_edge
+        self.breach_damage = breach_damage
+
+
+def estimate_attack(game_state, spawn_location, unit_type, count, threat_map=None):
+    """Estimates the outcome of spawning a group of mobile units without simulating it.
+
+    Every frame a unit spends on a tile, each enemy structure in range deals its damage to the group.
+    Structures focus one unit at a time, so the group loses one unit for every startHealth of damage.
+    Units move before structures attack, so no damage is taken on the frame a unit leaves a tile or
+    on the final tile, where it breaches. Shields and the group's own attacks are ignored.
+
+    Args:
+        game_state: The GameState to estimate on
+        spawn_location: Where the group would be spawned
+        unit_type: The type of mobile unit
+        count: The number of units in the group
+        threat_map: A ThreatMap of game_state to reuse when estimating many candidates
+
+    Returns:
+        An AttackEstimate, or None if no path can start at spawn_location
+
+    """
+    from .game_state import UNIT_TYPE_TO_INDEX
+    path = game_state.find_path_to_edge(spawn_location)
+    if not path:
+        return None
+    if threat_map is None:
+        threat_map = ThreatMap(game_state)
+    type_config = game_state.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
+    frames_per_tile = 1 / type_config.get("speed", 1)
+    health = type_config.get("startHealth", 1)
+    player_index = 0 if spawn_location[1] < HALF_ARENA else 1
+
+    damage = threat_map.get_damage(path[0], player_index) * (frames_per_tile - 1)
+    for location in path[1:-1]:
+        damage += threat_map.get_damage(location, player_index) * frames_per_tile
+    survivors = max(0, count - int(damage // health))
+    end = path[-1]
+    reaches_edge = (end[0], end[1]) in EDGE_SETS[game_state.get_target_edge(spawn_location)]
+    breach_damage = survivors * type_config.get("playerBreachDamage", 1) if reaches_edge else 0
+    return AttackEstimate(path, (len(path) - 1) * frames_per_tile, damage, survivors, reaches_edge, breach_damage)
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase.
+
+    Attributes :
+        * frames (int): The number of frames simulated
+        * points_scored ([float, float]): The health each player took from their opponent by breaching
+        * breaches ([int, int]): The number of each player's mobile units that reached their target edge
+        * structure_damage ([float, float]): The damage each player dealt to enemy structures
+        * mobile_damage ([float, float]): The damage each player dealt to enemy mobile units
+        * destroyed ([list, list]): The (unit_type, [x, y]) of each player's structures that were destroyed
+        * structures (list): The (unit_type, [x, y], player_index, health, upgraded) of every surviving structure
+
+    """
+    def __init__(self, config, frames, points_scored, breaches, structure_damage, mobile_damage, destroyed, structures):
+        self.config = config
+        self.frames = frames
+        self.points_scored = points_scored
+        self.breaches = breaches
+        self.structure_damage = structure_damage
+        self.mobile_damage = mobile_damage
+        self.destroyed = destroyed
+        self.structures = structures
+        self.__game_map = None
+
+    @property
+    def game_map(self):
+        """A GameMap holding the surviving structures at their final health, built the first time it is read
+        """
+        if self.__game_map is None:
+            game_map = GameMap(self.config)
+            for unit_type, location, player_index, health, upgraded in self.structures:
+                game_map.add_unit(unit_type, location, player_index)
+                unit = game_map[location][0]
+                if upgraded:
+                    unit.upgrade()
+                    game_map._update_structure_bits(location[0], location[1])
+                unit.health = health
+            self.__game_map = game_map
+        return self.__game_map
+
+
+class Simulator:
+    """Simulates the action phase of a turn frame by frame.
+
+    Units are kept as parallel lists indexed by a slot number rather than as GameUnits, and a tile
+    occupancy table is used for targeting. Pathing follows the same PathPolicy tables as
+    ShortestPathFinder and is rebuilt only when a structure is destroyed.
+
+    Each frame runs in this order:
+        1. Supports shield each friendly mobile unit in their shieldRange once, for shieldPerUnit plus
+           shieldBonusPerY for every row the support sits away from its owner's edge
+        2. Mobile units whose accumulated speed reaches a whole tile move one step along their path.
+           A unit that steps onto its target edge breaches, and a unit at the end of a path that does
+           not reach its target edge self destructs, damaging enemies within selfDestructRange if it
+           has moved at least selfDestructStepsRequired tiles
+        3. Every unit attacks the target get_target would choose. Targets are chosen before any of
+           this frame's damage is dealt
+        4. Units with no health left are removed
+
+    The simulation ends when no mobile units are left.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * frame (int): The number of frames simulated so far
+
+    """
+    _COPIED_LISTS = ["unit_type", "owner", "tile", "health", "stationary", "upgraded", "damage_f", "damage_i", "attack_range",
+                     "shield", "shield_range", "speed", "progress", "direction", "steps", "target_edge", "blocked",
+                     "_structure_bits", "_supports", "_mobile", "_attackers", "_dead_structures",
+                     "points_scored", "breaches", "structure_damage", "mobile_damage"]
+
+    def __init__(self, game_state, deploys=(), enemy_deploys=(), max_frames=2000):
+        """ Copies the units on the board and the planned deploys into the simulator
+
+        Every unit in game_state.game_map is included, so units already placed with attempt_spawn
+        should not be passed again in deploys. Deploys are checked like GameState.can_spawn, except for
+        cost: deploys out of bounds, in enemy territory, on a blocked tile, or for mobile units off
+        their player's edges are skipped with a warning.
+
+        Args:
+            game_state: The GameState to start from
+            deploys: Your additional units as (unit_type, location) or (unit_type, location, num) tuples
+            enemy_deploys: Your opponent's predicted units, in the same format as deploys
+            max_frames: A limit on the number of frames simulated
+
+        """
+        from .game_state import UNIT_TYPE_TO_INDEX
+        self.config = game_state.config
+        self.frame = 0
+        self.max_frames = max_frames
+        self._type_index = UNIT_TYPE_TO_INDEX
+        self._type_names = {index: name for name, index in UNIT_TYPE_TO_INDEX.items()}
+        self._get_target_edge = game_state.get_target_edge
+        self._in_arena_bounds = game_state.game_map.in_arena_bounds
+        self._spawn_edges = [(game_state.game_map.BOTTOM_LEFT, game_state.game_map.BOTTOM_RIGHT), (game_state.game_map.TOP_RIGHT, game_state.game_map.TOP_LEFT)]
+        self.warn = game_state.warn
+        self._hit_radius = self.config["unitInformation"][0].get("getHitRadius", 0)
+
+        self.unit_type = []
+        self.owner = []
+        self.tile = []
+        self.health = []
+        self.stationary = []
+        self.upgraded = []
+        self.damage_f = []
+        self.damage_i = []
+        self.attack_range = []
+        self.shield = []
+        self.shield_range = []
+        self.speed = []
+        self.progress = []
+        self.direction = []
+        self.steps = []
+        self.target_edge = []
+        self.shielded_by = []
+
+        self.tiles = [[] for _ in range(NUM_TILES)]
+        self.blocked = [False] * NUM_TILES
+        self._structure_bits = [0, 0]
+        self._fields = None
+        self._field_caches = {}
+        self._supports = []
+        self._mobile = []
+        self._attackers = []
+        self._dead_structures = []
+
+        self.points_scored = [0, 0]
+        self.breaches = [0, 0]
+        self.structure_damage = [0, 0]
+        self.mobile_damage = [0, 0]
+        self.destroyed = [[], []]
+
+        game_map = game_state.game_map
+        for x in range(ARENA_SIZE):
+            for y in range(ARENA_SIZE):
+                if IN_BOUNDS[x * ARENA_SIZE + y]:
+                    for unit in game_map[x, y]:
+                        self._add(unit)
+        self._add_deploys(deploys, 0)
+        self._add_deploys(enemy_deploys, 1)
+
+    def _add_deploys(self, deploys, player_index):
+        """Adds the deploys that pass _can_deploy
+
+        Returns:
+            The GameUnits that were added
+
+        """
+        added = []
+        for deploy in deploys:
+            unit_type, location = deploy[0], deploy[1]
+            for _ in range(deploy[2] if len(deploy) > 2 else 1):
+                unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
+                if self._can_deploy(unit):
+                    self._add(unit)
+                    added.append(unit)
+        return added
+
+    def _can_deploy(self, unit):
+        """Checks a deployed unit the way GameState.can_spawn does, apart from cost, and warns if it cannot be placed
+        """
+        location = [unit.x, unit.y]
+        if not self._in_arena_bounds(location):
+            self.warn("Could not simulate {} at location {}. Location invalid.".format(unit.unit_type, location))
+            return False
+        index = unit.x * ARENA_SIZE + unit.y
+        fail_reason = ""
+        if self.blocked[index] or (unit.stationary and self.tiles[index]):
+            fail_reason = fail_reason + " Location is blocked."
+        if (unit.y < HALF_ARENA) != (unit.player_index == 0):
+            fail_reason = fail_reason + " Location in enemy territory."
+        if not unit.stationary and not any((unit.x, unit.y) in EDGE_SETS[edge] for edge in self._spawn_edges[unit.player_index]):
+            fail_reason = fail_reason + " Information units must be deployed on the edge."
+        if fail_reason:
+            self.warn("Could not simulate {} at location {}.{}".format(unit.unit_type, location, fail_reason))
+            return False
+        return True
+
+    def _add(self, unit):
+        """Copies a GameUnit into a new slot
+        """
+        index = unit.x * ARENA_SIZE + unit.y
+        if unit.stationary and self.blocked[index]:
+            return
+        slot = len(self.unit_type)
+        self.unit_type.append(self._type_index[unit.unit_type])
+        self.owner.append(unit.player_index)
+        self.tile.append(index)
+        self.health.append(unit.health)
+        self.stationary.append(unit.stationary)
+        self.upgraded.append(unit.upgraded)
+        self.damage_f.append(unit.damage_f)
+        self.damage_i.append(unit.damage_i)
+        self.attack_range.append(_range_masks(unit.attackRange, self._hit_radius))
+        row = unit.y if unit.player_index == 0 else ARENA_SIZE - 1 - unit.y
+        self.shield.append(unit.shieldPerUnit + unit.shieldBonusPerY * row)
+        self.shield_range.append(_range_tiles(unit.shieldRange, 0, True))
+        self.speed.append(unit.speed)
+        self.progress.append(0)
+        self.direction.append(0)
+        self.steps.append(0)
+        self.target_edge.append(None if unit.stationary else self._get_target_edge([unit.x, unit.y]))
+        self.shielded_by.append(None if unit.stationary else set())
+        self.tiles[index].append(slot)
+        if unit.stationary:
+            self.blocked[index] = True
+            self._structure_bits[unit.player_index] |= 1 << index
+            self._fields = None
+            if self.shield[slot] > 0:
+                self._supports.append(slot)
+        else:
+            self._mobile.append(slot)
+        if unit.damage_f + unit.damage_i > 0:
+            self._attackers.append(slot)
+
+    def _clone(self):
+        """Copies the simulation so far. Distance fields are shared with the copy
+        """
+        clone = Simulator.__new__(Simulator)
+        clone.__dict__.update(self.__dict__)
+        for name in self._COPIED_LISTS:
+            setattr(clone, name, list(getattr(self, name)))
+        clone.tiles = list(map(list, self.tiles))
+        clone.shielded_by = [None if supports is None else set(supports) for supports in self.shielded_by]
+        clone.destroyed = [list(destroyed) for destroyed in self.destroyed]
+        return clone
+
+    def run(self):
+        """Simulates frames until no mobile units are left
+
+        Returns:
+            A SimulationResult
+
+        """
+        while self.step():
+            pass
+        return self.result()
+
+    def step(self):
+        """Simulates one frame
+
+        Returns:
+            True if there are mobile units left to simulate
+
+        """
+        if not self._mobile or self.frame >= self.max_frames:
+            return False
+        self._shield()
+        self._move()
+        self._attack()
+        self._remove_dead()
+        self.frame += 1
+        return bool(self._mobile)
+
+    def _shield(self):
+        health = self.health
+        owner = self.owner
+        stationary = self.stationary
+        for support in self._supports:
+            if health[support] <= 0:
+                continue
+            amount = self.shield[support]
+            for index, _ in self.shield_range[support][self.tile[support]]:
+                for slot in self.tiles[index]:
+                    if not stationary[slot] and owner[slot] == owner[support] and support not in self.shielded_by[slot]:
+                        self.shielded_by[slot].add(support)
+                        health[slot] += amount
+
+    def _move(self):
+        tiles = self.tiles
+        for slot in self._mobile:
+            if self.health[slot] <= 0:
+                continue
+            self.progress[slot] += self.speed[slot]
+            if self.progress[slot] < 1:
+                continue
+            self.progress[slot] -= 1
+            if self._fields is None:
+                key = self._structure_bits[0] | self._structure_bits[1]
+                self._fields = self._field_caches.get(key)
+                if self._fields is None:
+                    self._fields = DistanceFieldCache(list(self.blocked))
+                    self._field_caches[key] = self._fields
+            index = self.tile[slot]
+            target_edge = self.target_edge[slot]
+            policy = self._fields.get_policy(index, target_edge)
+            if policy.field[index] == 0:
+                self._self_destruct(slot)
+                continue
+            next_index, self.direction[slot] = policy.next_step(index, self.direction[slot])
+            tiles[index].remove(slot)
+            tiles[next_index].append(slot)
+            self.tile[slot] = next_index
+            self.steps[slot] += 1
+            if (TILE_X[next_index], TILE_Y[next_index]) in EDGE_SETS[target_edge]:
+                self._breach(slot)
+
+    def _breach(self, slot):
+        player_index = self.owner[slot]
+        damage = self.config["unitInformation"][self.unit_type[slot]].get("playerBreachDamage", 1)
+        self.points_scored[player_index] += damage
+        self.breaches[player_index] += 1
+        self.health[slot] = 0
+
+    def _self_destruct(self, slot):
+        type_config = self.config["unitInformation"][self.unit_type[slot]]
+        if self.steps[slot] >= type_config.get("selfDestructStepsRequired", 0):
+            player_index = self.owner[slot]
+            for index, _ in _range_tiles(type_config.get("selfDestructRange", 0), 0, True)[self.tile[slot]]:
+                for target in self.tiles[index]:
+                    if self.owner[target] == player_index or self.health[target] <= 0:
+                        continue
+                    if self.stationary[target]:
+                        self._damage(target, type_config.get("selfDestructDamageTower", 0), player_index)
+                    else:
+                        self._damage(target, type_config.get("selfDestructDamageWalker", 0), player_index)
+        self.health[slot] = 0
+
+    def _attack(self):
+        tiles = self.tiles
+        health = self.health
+        owner = self.owner
+        stationary = self.stationary
+        mobile_bits = [0, 0]
+        for slot in self._mobile:
+            if health[slot] > 0:
+                mobile_bits[owner[slot]] |= 1 << self.tile[slot]
+        hits = []
+        for attacker in self._attackers:
+            if health[attacker] <= 0:
+                continue
+            player_index = owner[attacker]
+            damage_f = self.damage_f[attacker]
+            damage_i = self.damage_i[attacker]
+            center = self.tile[attacker]
+            candidates = self.attack_range[attacker][center] & ((mobile_bits[1 - player_index] if damage_i else 0) | (self._structure_bits[1 - player_index] if damage_f else 0))
+            if not candidates:
+                continue
+            x = TILE_X[center]
+            y = TILE_Y[center]
+            flip = 1 if player_index == 0 else -1
+            target = None
+            target_key = None
+            while candidates:
+                low = candidates & -candidates
+                candidates ^= low
+                index = low.bit_length() - 1
+                distance = _DISTANCE[abs(TILE_X[index] - x) * ARENA_SIZE + abs(TILE_Y[index] - y)]
+                for slot in tiles[index]:
+                    if owner[slot] == player_index or health[slot] <= 0:
+                        continue
+                    if stationary[slot]:
+                        if damage_f == 0:
+                            continue
+                    elif damage_i == 0:
+                        continue
+                    key = (stationary[slot], distance, health[slot], flip * TILE_Y[index], TILE_X_DISTANCE[index])
+                    if target_key is None or key < target_key:
+                        target = slot
+                        target_key = key
+            if target is not None:
+                hits.append((attacker, target))
+
+        for attacker, target in hits:
+            self._damage(target, self.damage_f[attacker] if stationary[target] else self.damage_i[attacker], owner[attacker])
+
+    def _damage(self, slot, damage, player_index):
+        """Deals damage from a player to a unit, remembering structures it destroys
+        """
+        if self.stationary[slot]:
+            self.structure_damage[player_index] += damage
+            if self.health[slot] > 0 and self.health[slot] <= damage:
+                self._dead_structures.append(slot)
+        else:
+            self.mobile_damage[player_index] += damage
+        self.health[slot] -= damage
+
+    def _remove_dead(self):
+        health = self.health
+        tiles = self.tiles
+        for slot in self._mobile:
+            if health[slot] <= 0:
+                tiles[self.tile[slot]].remove(slot)
+        self._mobile = [slot for slot in self._mobile if health[slot] > 0]
+        if not self._dead_structures:
+            return
+        for slot in self._dead_structures:
+            index = self.tile[slot]
+            tiles[index].remove(slot)
+            self.blocked[index] = False
+            self._structure_bits[self.owner[slot]] &= ~(1 << index)
+            self.destroyed[self.owner[slot]].append((self._type_names[self.unit_type[slot]], [TILE_X[index], TILE_Y[index]]))
+        self._dead_structures = []
+        self._fields = None
+        self._attackers = [slot for slot in self._attackers if health[slot] > 0]
+        self._supports = [slot for slot in self._supports if health[slot] > 0]
+
+    def snapshot(self):
+        """Gets every unit that is still alive
+
+        Returns:
+            A list of (unit_type, [x, y], player_index, health) tuples, structures and mobile units alike
+
+        """
+        return [(self._type_names[self.unit_type[slot]], [TILE_X[index], TILE_Y[index]], self.owner[slot], self.health[slot])
+                for index in range(NUM_TILES) for slot in self.tiles[index]]
+
+    def result(self):
+        """Gets the outcome of the frames simulated so far
+
+        Returns:
+            A SimulationResult
+
+        """
+        structures = []
+        bits = self._structure_bits[0] | self._structure_bits[1]
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            index = low.bit_length() - 1
+            for slot in self.tiles[index]:
+                if self.stationary[slot]:
+                    structures.append((self._type_names[self.unit_type[slot]], [TILE_X[index], TILE_Y[index]], self.owner[slot], self.health[slot], self.upgraded[slot]))
+        return SimulationResult(self.config, self.frame, list(self.points_scored), list(self.breaches), list(self.structure_damage),
+                                list(self.mobile_damage), [list(destroyed) for destroyed in self.destroyed], structures)
+
+
+
+
+class BatchSimulator:
+    """Simulates many of your attack plans against the same board and enemy deploys in lockstep.
+
+    The board is read into a Simulator once, and every plan and the enemy deploys are added to a copy of it.
+    With NumPy the copies are then packed into (plans, slots) arrays, one per unit stat, where column i
+    holds slot i of each plan's Simulator. Each call to step advances every plan that still has mobile
+    units by one frame, in the same order as Simulator.step, using whole array operations:
+        1. Shields are one masked add per support slot
+        2. Next steps are read from a lookup table per board and target edge, filled from the shared
+           distance fields the first time a (tile, direction) is reached. Boards are keyed by the
+           structures left standing, so plans that destroy the same structures share them
+        3. Targets for every attacker of every plan are chosen at once, by keeping the candidates with
+           the lowest value of each key Simulator._attack compares in turn, and the damage is dealt in slot order
+    A plan in which a unit self destructs plays that frame's moves out one unit at a time instead,
+    since a self destruct can kill units that have not moved yet.
+
+    Results are the same as running a Simulator for each plan. Without NumPy, or with use_numpy False,
+    each plan keeps its Simulator and step advances them one after another.
+
+    Attributes :
+        * use_numpy (bool): Whether plans are simulated as NumPy arrays
+        * points_scored (array): After run, an (N, 2) array of each plan's SimulationResult.points_scored
+        * breaches (array): After run, an (N, 2) array of breaches
+        * structure_damage (array): After run, an (N, 2) array of damage dealt to structures
+        * mobile_damage (array): After run, an (N, 2) array of damage dealt to mobile units
+
+    The arrays are NumPy arrays when NumPy is installed and lists of lists otherwise.
+
+    """
+    _STATS = [("unit_type", int), ("owner", int), ("tile", int), ("health", float), ("stationary", bool),
+              ("upgraded", bool), ("damage_f", float), ("damage_i", float), ("shield", float), ("speed", float)]
+
+    def __init__(self, game_state, plans, enemy_deploys=(), max_frames=2000, use_numpy=None):
+        """ Sets up one simulation per plan
+
+        Args:
+            game_state: The GameState to start from
+            plans: A list of plans, each a list of deploys in the format Simulator takes
+            enemy_deploys: Your opponent's predicted units, shared by every plan
+            max_frames: A limit on the number of frames simulated
+            use_numpy: Whether to simulate the plans as NumPy arrays, defaults to True when NumPy is installed
+
+        """
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        base = Simulator(game_state, (), (), max_frames)
+        # Enemy deploys only ever land in enemy territory, so they can be checked once. They are added
+        # after each plan's deploys to keep the slot order of Simulator(game_state, plan, enemy_deploys)
+        enemy_units = base._clone()._add_deploys(enemy_deploys, 1)
+        simulators = []
+        for plan in plans:
+            simulator = base._clone()
+            simulator._add_deploys(plan, 0)
+            for unit in enemy_units:
+                simulator._add(unit)
+            simulators.append(simulator)
+        self.config = base.config
+        self.max_frames = max_frames
+        self._simulators = None
+        if self.use_numpy:
+            self._load(base, simulators)
+        else:
+            self._simulators = simulators
+        self.points_scored = None
+        self.breaches = None
+        self.structure_damage = None
+        self.mobile_damage = None
+
+    def _load(self, base, simulators):
+        """Packs the slots of every plan's Simulator into (plans, slots) arrays
+        """
+        plans = len(simulators)
+        slots = max([len(simulator.unit_type) for simulator in simulators], default=0)
+        shared = len(base.unit_type)
+        self._plans = plans
+        self._slots = slots
+        self._type_names = base._type_names
+
+        def pack(read, dtype, fill=0):
+            array = np.full((plans, slots), fill, dtype=dtype)
+            array[:, :shared] = read(base)
+            for plan, simulator in enumerate(simulators):
+                array[plan, shared:len(simulator.unit_type)] = read(simulator)[shared:]
+            return array
+
+        for name, dtype in self._STATS:
+            setattr(self, name, pack(lambda simulator: getattr(simulator, name), dtype))
+        self.target_edge = pack(lambda simulator: [-1 if edge is None else edge for edge in simulator.target_edge], int, -1)
+        range_ids = {}
+        ranges = []
+
+        def range_ids_of(tables):
+            ids = []
+            for table in tables:
+                range_id = range_ids.get(id(table))
+                if range_id is None:
+                    range_id = range_ids[id(table)] = len(ranges)
+                    ranges.append(_range_array(table))
+                ids.append(range_id)
+            return ids
+
+        self.attack_range = pack(lambda simulator: range_ids_of(simulator.attack_range), int)
+        self.shield_range = pack(lambda simulator: range_ids_of(simulator.shield_range), int)
+        # _in_range[(range_id * NUM_TILES + center) * NUM_TILES + index] is True if index is in range of center
+        self._in_range = np.array(ranges, dtype=bool).reshape(-1)
+        self._alive = pack(lambda simulator: [True] * len(simulator.unit_type), bool, False)
+        self._attacks = (self.damage_f != 0) | (self.damage_i != 0)
+        self._supports = self.stationary & (self.shield > 0)
+        self._support_slots = np.flatnonzero(self._supports.any(0))
+        self._shielded = np.zeros((plans, slots, len(self._support_slots)), dtype=bool)
+        # Units on a tile are targeted in the order they arrived there, which starts as slot order
+        self._arrival = np.tile(np.arange(slots), (plans, 1))
+        self.progress = np.zeros((plans, slots))
+        self.direction = np.zeros((plans, slots), dtype=int)
+        self.steps = np.zeros((plans, slots), dtype=int)
+
+        self._tile_x = np.array(TILE_X)
+        self._tile_y = np.array(TILE_Y)
+        self._tile_x_distance = np.array(TILE_X_DISTANCE)
+        self._on_edge = np.zeros((len(EDGE_INDICES), NUM_TILES), dtype=bool)
+        for edge, indices in enumerate(EDGE_INDICES):
+            self._on_edge[edge, indices] = True
+        unit_information = self.config["unitInformation"]
+        self._breach_damage = np.array([type_config.get("playerBreachDamage", 1) for type_config in unit_information], dtype=float)
+
+        self._field_caches = []
+        self._board_ids = {}
+        # _next_steps[board, edge, index * 3 + direction] is next_index * 3 + direction, -1 to self destruct, -2 if not read yet
+        self._next_steps = np.full((1, len(EDGE_INDICES), NUM_TILES * 3), -2, dtype=np.int32)
+        self._structure_bits = [simulator._structure_bits[0] | simulator._structure_bits[1] for simulator in simulators]
+        self._board = np.array([self._get_board(bits) for bits in self._structure_bits], dtype=int)
+        self._killed = {}
+
+        self._frames = np.zeros(plans, dtype=int)
+        self._running = (self._alive & ~self.stationary).any(1) & (self._frames < self.max_frames)
+        self._points_scored = np.zeros((plans, 2))
+        self._breaches = np.zeros((plans, 2), dtype=int)
+        self._structure_damage = np.zeros((plans, 2))
+        self._mobile_damage = np.zeros((plans, 2))
+        self._destroyed = [[[], []] for _ in range(plans)]
+
+    def _get_board(self, bits):
+        """Gets the id of the board with structures on the tiles set in bits, adding it the first time it is seen
+        """
+        board = self._board_ids.get(bits)
+        if board is None:
+            board = self._board_ids[bits] = len(self._field_caches)
+            blocked = np.unpackbits(np.frombuffer(bits.to_bytes((NUM_TILES + 7) // 8, "little"), dtype=np.uint8), bitorder="little")
+            self._field_caches.append(DistanceFieldCache(blocked[:NUM_TILES].astype(bool).tolist()))
+            if board == len(self._next_steps):
+                grown = np.full((2 * board,) + self._next_steps.shape[1:], -2, dtype=np.int32)
+                grown[:board] = self._next_steps
+                self._next_steps = grown
+        return board
+
+    def _get_next_steps(self, boards, edges, keys):
+        """Gets the next_index * 3 + direction of units on the given boards, or -1 for units that self destruct
+        """
+        steps = self._next_steps[boards, edges, keys]
+        unknown = steps == -2
+        if unknown.any():
+            _, edge_count, key_count = self._next_steps.shape
+            for code in np.unique((boards[unknown] * edge_count + edges[unknown]) * key_count + keys[unknown]).tolist():
+                board_edge, key = divmod(code, key_count)
+                board, edge = divmod(board_edge, edge_count)
+                index = key // 3
+                policy = self._field_caches[board].get_policy(index, edge)
+                self._next_steps[board, edge, key] = -1 if policy.field[index] == 0 else policy._step(key)
+            steps = self._next_steps[boards, edges, keys]
+        return steps
+
+    def step(self):
+        """Simulates one frame of every plan that is still running
+
+        Returns:
+            True if any plan has mobile units left to simulate
+
+        """
+        if not self.use_numpy:
+            running = False
+            for simulator in self._simulators:
+                if simulator.step():
+                    running = True
+            return running
+        if not self._running.any():
+            return False
+        self._shield()
+        self._move()
+        self._attack()
+        self._remove_dead()
+        self._frames[self._running] += 1
+        self._running &= (self._alive & ~self.stationary).any(1) & (self._frames < self.max_frames)
+        return bool(self._running.any())
+
+    def _shield(self):
+        mobile = self._alive & ~self.stationary & self._running[:, None]
+        if not mobile.any():
+            return
+        for column, support in enumerate(self._support_slots):
+            supporting = self._alive[:, support] & self._supports[:, support] & (self.health[:, support] > 0)
+            if not supporting.any():
+                continue
+            in_range = self._in_range[(self.shield_range[:, support] * NUM_TILES + self.tile[:, support])[:, None] * NUM_TILES + self.tile]
+            shielded = (mobile & supporting[:, None] & in_range & (self.owner == self.owner[:, support, None])
+                        & ~self._shielded[:, :, column])
+            self._shielded[:, :, column] |= shielded
+            np.add(self.health, self.shield[:, support, None], out=self.health, where=shielded)
+
+    def _move(self):
+        moving = self._alive & ~self.stationary & self._running[:, None] & (self.health > 0)
+        progress = np.where(moving, self.progress + self.speed, self.progress)
+        plan, slot = np.nonzero(moving & (progress >= 1))
+        edges = self.target_edge[plan, slot]
+        steps = self._get_next_steps(self._board[plan], edges, self.tile[plan, slot] * 3 + self.direction[plan, slot])
+        destructs = np.unique(plan[steps == -1])
+        if len(destructs):
+            kept = ~np.isin(plan, destructs)
+            plan, slot, edges, steps = plan[kept], slot[kept], edges[kept], steps[kept]
+            progress[destructs] = self.progress[destructs]
+        self.progress = progress
+        self.progress[plan, slot] -= 1
+        tiles = steps // 3
+        self.tile[plan, slot] = tiles
+        self.direction[plan, slot] = steps % 3
+        self.steps[plan, slot] += 1
+        self._arrival[plan, slot] = (self._frames[plan] + 1) * self._slots + slot
+        breached = self._on_edge[edges, tiles]
+        self._breach(plan[breached], slot[breached])
+        for plan in destructs:
+            self._move_plan(plan)
+
+    def _move_plan(self, plan):
+        """Moves the units of one plan one at a time, like Simulator._move
+        """
+        for slot in np.flatnonzero(self._alive[plan] & ~self.stationary[plan]):
+            if self.health[plan, slot] <= 0:
+                continue
+            self.progress[plan, slot] += self.speed[plan, slot]
+            if self.progress[plan, slot] < 1:
+                continue
+            self.progress[plan, slot] -= 1
+            edge = self.target_edge[plan, slot]
+            step = self._get_next_steps(self._board[[plan]], self.target_edge[plan, [slot]], self.tile[plan, [slot]] * 3 + self.direction[plan, [slot]])[0]
+            if step == -1:
+                self._self_destruct(plan, slot)
+                continue
+            self.tile[plan, slot], self.direction[plan, slot] = divmod(step, 3)
+            self.steps[plan, slot] += 1
+            self._arrival[plan, slot] = (self._frames[plan] + 1) * self._slots + slot
+            if self._on_edge[edge, self.tile[plan, slot]]:
+                self._breach(np.array([plan]), np.array([slot]))
+
+    def _breach(self, plan, slot):
+        owner = self.owner[plan, slot]
+        np.add.at(self._points_scored, (plan, owner), self._breach_damage[self.unit_type[plan, slot]])
+        np.add.at(self._breaches, (plan, owner), 1)
+        self.health[plan, slot] = 0
+
+    def _self_destruct(self, plan, slot):
+        type_config = self.config["unitInformation"][self.unit_type[plan, slot]]
+        if self.steps[plan, slot] >= type_config.get("selfDestructStepsRequired", 0):
+            player_index = self.owner[plan, slot]
+            present = np.flatnonzero(self._alive[plan])
+            tiles = {}
+            for target in present[np.argsort(self._arrival[plan, present])]:
+                tiles.setdefault(self.tile[plan, target], []).append(target)
+            for index, _ in _range_tiles(type_config.get("selfDestructRange", 0), 0, True)[self.tile[plan, slot]]:
+                for target in tiles.get(index, ()):
+                    if self.owner[plan, target] == player_index or self.health[plan, target] <= 0:
+                        continue
+                    if self.stationary[plan, target]:
+                        self._damage(plan, target, type_config.get("selfDestructDamageTower", 0), player_index)
+                    else:
+                        self._damage(plan, target, type_config.get("selfDestructDamageWalker", 0), player_index)
+        self.health[plan, slot] = 0
+
+    def _damage(self, plan, slot, damage, player_index):
+        """Deals damage from a player to a unit of one plan, like Simulator._damage
+        """
+        if self.stationary[plan, slot]:
+            self._structure_damage[plan, player_index] += damage
+            if 0 < self.health[plan, slot] <= damage:
+                self._killed.setdefault(plan, []).append(slot)
+        else:
+            self._mobile_damage[plan, player_index] += damage
+        self.health[plan, slot] -= damage
+
+    def _attack(self):
+        present = self._alive & (self.health > 0)
+        attacking = present & self._attacks & self._running[:, None]
+        hits = []
+        for player_index in (0, 1):
+            enemies = present & (self.owner != player_index)
+            # Mobile units are always targeted first, so structures are only searched for attackers with no mobile unit in range
+            for damage, targetable in ((self.damage_i, enemies & ~self.stationary), (self.damage_f, enemies & self.stationary)):
+                plan, slot = np.nonzero(attacking & (self.owner == player_index) & (damage != 0) & targetable.any(1)[:, None])
+                target = self._get_targets(plan, slot, player_index, targetable)
+                attacking[plan[target >= 0], slot[target >= 0]] = False
+                hits.append((plan, slot, target))
+        plan, slot, target = (np.concatenate(arrays) for arrays in zip(*hits))
+        hit = np.lexsort((slot, plan))
+        hit = hit[target[hit] >= 0]
+        plan, slot, target = plan[hit], slot[hit], target[hit]
+
+        owner = self.owner[plan, slot]
+        stationary = self.stationary[plan, target]
+        damage = np.where(stationary, self.damage_f[plan, slot], self.damage_i[plan, slot])
+        health = self.health[plan, target]
+        np.subtract.at(self.health, (plan, target), damage)
+        np.add.at(self._structure_damage, (plan[stationary], owner[stationary]), damage[stationary])
+        np.add.at(self._mobile_damage, (plan[~stationary], owner[~stationary]), damage[~stationary])
+
+        # Hits are in slot order within a plan, so replaying them gives the order structures were destroyed in
+        destroyed = stationary & (health > 0) & (self.health[plan, target] <= 0)
+        for killer in np.unique(plan[destroyed]):
+            remaining = {}
+            for i in np.flatnonzero((plan == killer) & stationary):
+                current = remaining.get(target[i], health[i])
+                if 0 < current <= damage[i]:
+                    self._killed.setdefault(killer, []).append(target[i])
+                remaining[target[i]] = current - damage[i]
+
+    def _get_targets(self, plan, slot, player_index, targetable):
+        """Gets the slot each attacker of a player would target out of the targetable units of its plan, or -1 if there is none
+        """
+        found = np.full(len(plan), -1)
+        targets = np.flatnonzero(targetable.any(0))
+        if not len(plan) or not len(targets):
+            return found
+        center = self.tile[plan, slot]
+        tile = self.tile[plan[:, None], targets]
+        candidates = targetable[plan[:, None], targets] & self._in_range[(self.attack_range[plan, slot] * NUM_TILES + center)[:, None] * NUM_TILES + tile]
+        choosing = np.flatnonzero(candidates.any(1))
+        if not len(choosing):
+            return found
+        plan, center, tile, candidates = plan[choosing], center[choosing], tile[choosing], candidates[choosing]
+
+        # The same keys as Simulator._attack, then the order units are visited in: by tile, then by arrival
+        keys = [lambda: np.sqrt((self._tile_x[tile] - self._tile_x[center][:, None]) ** 2 + (self._tile_y[tile] - self._tile_y[center][:, None]) ** 2),
+                lambda: self.health[plan[:, None], targets],
+                lambda: self._tile_y[tile] if player_index == 0 else -self._tile_y[tile],
+                lambda: self._tile_x_distance[tile],
+                lambda: tile,
+                lambda: self._arrival[plan[:, None], targets]]
+        for key in keys:
+            if candidates.sum(1).max() <= 1:
+                break
+            values = np.where(candidates, key(), np.inf)
+            candidates &= values == values.min(1, keepdims=True)
+        found[choosing] = targets[candidates.argmax(1)]
+        return found
+
+    def _remove_dead(self):
+        self._alive &= self.stationary | (self.health > 0)
+        for plan, slots in self._killed.items():
+            bits = self._structure_bits[plan]
+            for slot in slots:
+                index = self.tile[plan, slot]
+                self._alive[plan, slot] = False
+                bits &= ~(1 << int(index))
+                self._destroyed[plan][self.owner[plan, slot]].append((self._type_names[self.unit_type[plan, slot]], [TILE_X[index], TILE_Y[index]]))
+            self._structure_bits[plan] = bits
+            self._board[plan] = self._get_board(bits)
+        self._killed = {}
+
+    def run(self):
+        """Simulates every plan until no mobile units are left
+
+        Returns:
+            A list of SimulationResults in the order of plans
+
+        """
+        while self.step():
+            pass
+        results = self.results()
+        if self.use_numpy:
+            self.points_scored = self._points_scored.copy()
+            self.breaches = self._breaches.copy()
+            self.structure_damage = self._structure_damage.copy()
+            self.mobile_damage = self._mobile_damage.copy()
+        else:
+            for name in ("points_scored", "breaches", "structure_damage", "mobile_damage"):
+                totals = [getattr(result, name) for result in results]
+                setattr(self, name, np.array(totals, dtype=float).reshape(len(results), 2) if np is not None else totals)
+        return results
+
+    def results(self):
+        """Gets the outcome of the frames simulated so far for every plan
+
+        Returns:
+            A list of SimulationResults in the order of plans
+
+        """
+        if not self.use_numpy:
+            return [simulator.result() for simulator in self._simulators]
+        results = []
+        for plan in range(self._plans):
+            structures = []
+            slots = np.flatnonzero(self._alive[plan] & self.stationary[plan])
+            for slot in slots[np.argsort(self.tile[plan, slots], kind="stable")]:
+                index = self.tile[plan, slot]
+                structures.append((self._type_names[self.unit_type[plan, slot]], [TILE_X[index], TILE_Y[index]], int(self.owner[plan, slot]),
+                                   self.health[plan, slot].item(), bool(self.upgraded[plan, slot])))
+            results.append(SimulationResult(self.config, int(self._frames[plan]), self._points_scored[plan].tolist(), self._breaches[plan].tolist(),
+                                            self._structure_damage[plan].tolist(), self._mobile_damage[plan].tolist(),
+                                            [list(destroyed) for destroyed in self._destroyed[plan]], structures))
+        return results
@@ -2,6 +2,13 @@ import unittest
 import json
 from .game_state import GameState
 from .unit import GameUnit
+from .unit_store import UnitStore
+from .navigation import ShortestPathFinder
+from .threat_map import ThreatMap
+from .board_arrays import BoardArrays, HAS_NUMPY
+from .simulator import Simulator, BatchSimulator, estimate_attack
+from .game_map import BOTTOM_HALF_MASK, TOP_HALF_MASK
+from .util import GameMessage
 
 class BasicTests(unittest.TestCase):
 
@@ -192,6 +199,12 @@ class BasicTests(unittest.TestCase):
         state.suppress_warnings(True)
         return state
 
+    def make_walled_map(self):
+        game = self.make_turn_0_map()
+        for location in [[13, 2], [14, 2], [12, 3], [5, 10], [20, 10]]:
+            game.game_map.add_unit("FF", location)
+        return game
+
     def test_basic(self):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
 
@@ -225,6 +238,20 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(0, len(game.game_map.get_locations_in_range([-500,-500], 10)), "Invalid tiles are being marked as in range")
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "A location should be in range of itself")
     
+    def test_geometry_tables(self):
+        game = self.make_turn_0_map()
+        locations = list(game.game_map)
+        self.assertEqual(420, len(locations), "The diamond should have 420 tiles")
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], locations[:3], "The map should be iterated row by row from the bottom")
+        self.assertEqual(True, game.game_map.is_edge_location([0, 13], game.game_map.BOTTOM_LEFT), "[0, 13] is on the bottom left edge")
+        self.assertEqual(False, game.game_map.is_edge_location([1, 13], game.game_map.BOTTOM_LEFT), "[1, 13] is not on an edge")
+        self.assertEqual(210, bin(BOTTOM_HALF_MASK).count("1"), "Each half of the board should have 210 tiles")
+        self.assertEqual(0, BOTTOM_HALF_MASK & TOP_HALF_MASK, "The halves of the board should not overlap")
+
+        edges = game.game_map.get_edges()
+        edges[0].append([0, 0])
+        self.assertEqual(14, len(game.game_map.get_edges()[0]), "Callers should not be able to change the shared edge tables")
+
     def test_get_units(self):
         game = self.make_turn_0_map()
         self.assertEqual(0, len(game.game_map[13,13]), "There should not be a unit on this location")
@@ -239,6 +266,442 @@ class BasicTests(unittest.TestCase):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
+        self.assertEqual(14, len(game.game_map.get_locations_in_range([13,0], 3.5)), "Tiles outside the diamond should be clipped")
+        self.assertEqual(game.game_map.get_locations_in_range([0,13], 2.5), [list(location) for location in game.game_map.iter_locations_in_range([0,13], 2.5)], "The iterator should visit the same tiles in the same order")
+        locations = game.game_map.get_locations_in_range([13,13], 3.5)
+        locations.append([0, 0])
+        self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Callers should not be able to change the cached stencil")
+
+    def test_structure_bitboards(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 13], 0)
+        game.game_map.add_unit("DF", [14, 14], 1)
+        game.game_map.add_unit("EI", [13, 0], 0)
+        self.assertEqual(1 << (13 * 28 + 13), game.game_map.get_structure_bitboard(0), "Only my wall should be on my bitboard")
+        self.assertEqual(1 << (14 * 28 + 14), game.game_map.get_structure_bitboard(1), "Only the enemy turret should be on their bitboard")
+        self.assertEqual(False, game.game_map.is_blocked([13, 0]), "Mobile units should not block a location")
+
+        fingerprint = game.game_map.get_structure_fingerprint()
+        game.game_map.remove_unit([13, 13])
+        self.assertEqual(False, game.game_map.is_blocked([13, 13]), "Removed structures should leave the bitboard")
+        game.game_map.add_unit("FF", [13, 13], 0)
+        self.assertEqual(fingerprint, game.game_map.get_structure_fingerprint(), "Equal layouts should have equal fingerprints")
+
+        state = json.loads(game.serialized_string)
+        state["p1Units"][0].append([13, 13, 75.0, "1"])
+        state["p2Units"][2].append([14, 14, 90.0, "2"])
+        parsed = GameState(game.config, json.dumps(state))
+        self.assertEqual(fingerprint, parsed.game_map.get_structure_fingerprint(), "Parsed structures should be on the bitboards")
+
+    def test_unit_index(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("DF", [10, 16], 1)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        game.game_map.add_unit("DF", [13, 10], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+
+        self.assertEqual([[10, 16], [13, 16]], game.game_map.get_unit_locations(1, "DF"), "Enemy turret locations are wrong")
+        self.assertEqual(3, game.game_map.count_units(1), "Enemy unit count is wrong")
+        self.assertEqual(2, game.game_map.count_units(0, "PI"), "Stacked mobile units should each be counted")
+        self.assertEqual([13, 16], game.game_map.get_nearest_unit_location([14, 14], 1, "DF"), "Nearest enemy turret is wrong")
+        self.assertEqual(None, game.game_map.get_nearest_unit_location([14, 14], 0, "EF"), "There are no supports")
+
+        game.game_map.add_unit("FF", [13, 16], 1)
+        game.game_map.remove_unit([13, 0])
+        self.assertEqual([[10, 16]], game.game_map.get_unit_locations(1, "DF"), "Replaced structures should leave the index")
+        self.assertEqual([[13, 16], [14, 15]], game.game_map.get_unit_locations(1, "FF"), "Walls should be indexed")
+        self.assertEqual(0, game.game_map.count_units(0, "PI"), "Removed units should leave the index")
+
+        fork = game.game_map.fork()
+        fork.remove_unit([10, 16])
+        self.assertEqual(1, game.game_map.count_units(1, "DF"), "Forks should have their own index")
+        self.assertEqual(0, fork.count_units(1, "DF"), "The fork should see its own changes")
+
+        state = json.loads(game.serialized_string)
+        state["p2Units"][2].append([14, 14, 75.0, "1"])
+        state["p2Units"][3].append([14, 27, 15.0, "2"])
+        parsed = GameState(game.config, json.dumps(state))
+        self.assertEqual([[14, 14]], parsed.game_map.get_unit_locations(1, "DF"), "Parsed structures should be indexed")
+        self.assertEqual(1, parsed.game_map.count_units(1, "PI"), "Parsed mobile units should be indexed")
+
+    def test_board_hash(self):
+        game = self.make_turn_0_map()
+        empty_hash = game.board_hash
+        game.attempt_spawn("DF", [13, 10])
+        game.attempt_spawn("FF", [12, 11])
+        game.attempt_spawn("PI", [13, 0])
+        other = self.make_turn_0_map()
+        other.attempt_spawn("FF", [12, 11])
+        other.attempt_spawn("DF", [13, 10])
+        self.assertEqual(game.board_hash, other.board_hash, "Build order and mobile units should not change the hash")
+        self.assertNotEqual(empty_hash, game.board_hash, "Structures should change the hash")
+
+        before_upgrade = game.board_hash
+        with game.speculate():
+            game.attempt_upgrade([13, 10])
+            self.assertNotEqual(before_upgrade, game.board_hash, "Upgrades should change the hash")
+            game.attempt_spawn("FF", [14, 11])
+        self.assertEqual(before_upgrade, game.board_hash, "Rolling back should restore the hash")
+
+        fork = game.fork()
+        fork.game_map.remove_unit([12, 11])
+        fork.game_map.remove_unit([13, 10])
+        self.assertEqual(empty_hash, fork.board_hash, "Removing every structure should give the empty hash")
+        self.assertEqual(before_upgrade, game.board_hash, "Forks should hash on their own")
+
+        state = json.loads(game.serialized_string)
+        state["p1Units"][0].append([12, 11, 10.0, "1"])
+        state["p1Units"][2].append([13, 10, 75.0, "2"])
+        parsed = GameState(game.config, json.dumps(state))
+        self.assertEqual(game.board_hash, parsed.board_hash, "Parsed boards should hash like built ones")
+        self.assertEqual(game.board_hash, parsed.game_map.get_board_hash(), "board_hash should match GameMap.get_board_hash")
+        self.assertNotEqual(game.game_map.get_board_hash(4), parsed.game_map.get_board_hash(4), "Health buckets should tell damaged structures apart")
+        self.assertEqual(game.game_map.get_board_hash(4), game.fork().game_map.get_board_hash(4), "Equal health should hash equally")
+
+    def test_parsed_messages(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Units"][2].append([13, 10, 75.0, "1"])
+        message = GameMessage(json.dumps(state))
+        self.assertEqual(json.dumps(state), message, "A GameMessage should still be the raw string")
+        self.assertIs(message.state, message.state, "A GameMessage should only be decoded once")
+
+        for serialized in [json.dumps(state), message, state]:
+            parsed = GameState(game.config, serialized)
+            self.assertEqual(75.0, parsed.game_map[13, 10][0].health, "GameState should accept {}".format(type(serialized).__name__))
+            self.assertEqual(30, parsed.my_health, "GameState should read stats from {}".format(type(serialized).__name__))
+
+    def test_message_header(self):
+        message = GameMessage('{"p2Units": [[], []], "turnInfo": [1, 4, 37, 0], "events": {}}')
+        self.assertEqual([1, 4, 37], message.turn_info, "turnInfo should be read from the middle of the line")
+        self.assertFalse(hasattr(message, "_state"), "Reading turnInfo should not decode the message")
+        self.assertEqual([2, 10, 0], GameMessage('{"turnInfo":[2,10,0,0]}').turn_info, "Compact json should be read too")
+        self.assertEqual(None, GameMessage('{"debug": {}, "replaySave": 1}').turn_info, "Messages without turnInfo have no header")
+
+    def test_threat_map(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("DF", [15, 16], 1)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        game.game_map.add_unit("DF", [13, 10], 0)
+        threats = ThreatMap(game)
+        for location in game.game_map:
+            for player_index in (0, 1):
+                attackers = game.get_attackers(location, player_index)
+                self.assertEqual(len(attackers), threats.get_attacker_count(location, player_index), "Attacker counts should match get_attackers at {}".format(location))
+                self.assertEqual(sum(unit.damage_i for unit in attackers), threats.get_damage(location, player_index), "Damage should match get_attackers at {}".format(location))
+
+        self.assertEqual(0, threats.get_attacker_count([13, 13], 0), "[13, 13] should be out of the turret's base range")
+        threats.remove_structure(game.game_map[13, 16][0])
+        game.game_map.remove_unit([13, 16])
+        game.game_map.add_unit("DF", [13, 16], 1)
+        turret = game.game_map[13, 16][0]
+        turret.upgrade()
+        game.game_map._update_structure_bits(13, 16)
+        threats.add_structure(turret)
+        self.assertEqual(1, threats.get_attacker_count([13, 13], 0), "Upgraded turrets should reach further")
+        self.assertEqual(len(game.get_attackers([13, 13], 0)), threats.get_attacker_count([13, 13], 0), "Upgraded turrets should agree with get_attackers")
+        self.assertEqual(0, threats.get_damage([13, 25], 0), "Tiles out of range of every structure should be safe")
+
+    def test_board_arrays(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        game.game_map.add_unit("DF", [13, 10], 0)
+        for x in range(1, 27):
+            game.game_map.add_unit("FF", [x, 12], 0)
+        backends = [BoardArrays(game, use_numpy=False)]
+        if HAS_NUMPY:
+            backends.append(BoardArrays(game))
+        threats = ThreatMap(game)
+        for arrays in backends:
+            damage, attackers = arrays.threat(0)
+            self.assertEqual(threats.get_damage([13, 13], 0), damage[13][13], "Board arrays should agree with ThreatMap")
+            self.assertEqual(threats.get_attacker_count([14, 14], 0), attackers[14][14], "Board arrays should agree with ThreatMap")
+            self.assertEqual(True, arrays.blocked_mask()[14][15], "Structures should block their tile")
+            distance = arrays.distance_to_edge(game.game_map.TOP_RIGHT)
+            self.assertEqual(0, distance[27][14], "Edge tiles should be 0 away from their edge")
+            self.assertEqual(14, distance[13][14], "Distances should count steps to the nearest edge tile")
+            self.assertEqual(-1, distance[13][11], "Tiles walled off from the edge should be unreachable")
+
+    def test_get_attackers_batch(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("DF", [15, 16], 1)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        game.game_map[15, 16][0].upgrade()
+        path = game.find_path_to_edge([13, 0])
+        batch = game.get_attackers_batch(path, 0)
+        self.assertEqual([game.get_attackers(location, 0) for location in path], batch, "Batched attackers should match get_attackers in order")
+        self.assertEqual([len(attackers) for attackers in batch], game.get_attackers_batch(path, 0, counts=True), "Counts should match the attacker lists")
+        self.assertEqual([[]], game.get_attackers_batch([[13, 13]], 1), "Structures should not attack their own units")
+
+    def test_get_attackers_appended(self):
+        game = self.make_turn_0_map()
+        game.game_map[13, 15].append(GameUnit("DF", game.config, 1, None, 13, 15))
+        self.assertEqual(1, len(game.get_attackers([13, 13], 0)), "Units appended straight to the map should still attack")
+        for x in range(0, 28, 2):
+            game.game_map.add_unit("DF", [x, 20], 1)
+        self.assertEqual(1, len(game.get_attackers([13, 13], 0)), "Attackers should not depend on how many turrets are on the board")
+
+    def test_get_targets_batch(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("DF", [12, 15], 1)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.game_map.add_unit("FF", [12, 13], 0)
+        game.game_map.add_unit("PI", [13, 13], 0)
+        game.game_map.add_unit("PI", [14, 13], 0)
+        game.game_map[14, 13][0].health = 5
+        pairs = game.get_targets_batch()
+        self.assertEqual([game.get_target(attacker) for attacker, _ in pairs], [target for _, target in pairs], "Batched targets should match get_target")
+        targets = dict((id(attacker), target) for attacker, target in pairs)
+        self.assertEqual(game.game_map[13, 13][0], targets[id(game.game_map[12, 15][0])], "Turrets should prefer mobile units over nearer structures")
+        self.assertEqual(game.game_map[14, 15][0], targets[id(game.game_map[13, 13][0])], "Ties in distance should go to the structure with the lowest health")
+        self.assertEqual([(game.game_map[14, 15][0], None)], game.get_targets_batch([game.game_map[14, 15][0]]), "Units that deal no damage have no target")
+
+    def test_simulator(self):
+        game = self.make_turn_0_map()
+        for x in range(5, 23):
+            game.game_map.add_unit("FF", [x, 10], 0)
+        path = game.find_path_to_edge([13, 0])
+        result = Simulator(game, [("PI", [13, 0])]).run()
+        self.assertEqual([1, 0], result.breaches, "An unopposed scout should breach")
+        self.assertEqual(1, result.points_scored[0], "A breach should score playerBreachDamage")
+        self.assertEqual(len(path) - 1, result.frames, "A scout should take one step per frame along its path")
+
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [24, 14], 1)
+        game.game_map.add_unit("FF", [24, 15], 1)
+        simulator = Simulator(game, [("PI", [13, 0], 5)], [("SI", [14, 27])])
+        self.assertEqual(8, len(simulator.snapshot()), "Every structure and deployed unit should be copied into the simulator")
+        result = simulator.run()
+        self.assertEqual(0, len(simulator.snapshot()) - len(result.structures), "Every mobile unit should be gone at the end")
+        self.assertEqual([4, 1], result.breaches, "The turret should stop one of the scouts")
+        self.assertEqual(25, result.mobile_damage[1], "The turret should fire once per frame while scouts are in range")
+        self.assertEqual(90 - result.structure_damage[0], result.game_map[24, 14][0].health, "Scouts should attack the nearest structure")
+        self.assertEqual(len(result.structures), len(list(unit for location in result.game_map for unit in result.game_map[location])), "The final map should hold the surviving structures")
+
+    def test_simulator_deploys(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 5], 0)
+        deploys = [("PI", [0, 0]), ("PI", [13, 5]), ("PI", [13, 4]), ("PI", [14, 27]), ("FF", [13, 5]), ("FF", [13, 20])]
+        simulator = Simulator(game, deploys, [("SI", [13, 0])])
+        self.assertEqual(1, len(simulator.snapshot()), "Out of bounds, blocked, off edge and enemy territory deploys should be skipped")
+        result = simulator.run()
+        self.assertEqual(0, result.frames, "Nothing should be simulated without valid mobile deploys")
+
+        simulator = Simulator(game, [("PI", [13, 0]), ("FF", [12, 5])], [("SI", [14, 27])])
+        self.assertEqual(4, len(simulator.snapshot()), "Valid deploys should be kept")
+
+    def test_batch_simulator(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [24, 14], 1)
+        game.game_map.add_unit("FF", [24, 15], 1)
+        game.game_map.add_unit("EF", [12, 5], 0)
+        walled = [("FF", [x, 10]) for x in range(4, 24)] + [("PI", [13, 0], 3)]
+        plans = [[("PI", [13, 0], 5)], [("PI", [14, 0], 2), ("EI", [13, 0])], [], walled]
+        batch = BatchSimulator(game, plans, [("SI", [14, 27])])
+        results = batch.run()
+        sequential = BatchSimulator(game, plans, [("SI", [14, 27])], use_numpy=False).run()
+        for plan, result, unbatched in zip(plans, results, sequential):
+            single = Simulator(game, plan, [("SI", [14, 27])]).run()
+            for other in (result, unbatched):
+                self.assertEqual((single.frames, single.points_scored, single.breaches, single.structure_damage, single.mobile_damage, single.destroyed, single.structures),
+                                 (other.frames, other.points_scored, other.breaches, other.structure_damage, other.mobile_damage, other.destroyed, other.structures),
+                                 "Batched plans should play out like single simulations")
+        self.assertEqual([[4, 1], [2, 1], [0, 1], [0, 1]], [list(row) for row in batch.breaches], "Totals should have one row per plan")
+
+    def test_estimate_attack(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [24, 14], 1)
+        threats = ThreatMap(game)
+        estimate = estimate_attack(game, [13, 0], "PI", 5, threats)
+        self.assertEqual(game.find_path_to_edge([13, 0]), estimate.path, "The estimate should follow the predicted path")
+        self.assertEqual(25, estimate.damage_taken, "The turret should hit the group once per frame in range")
+        self.assertEqual(4, estimate.survivors, "Scouts should die one at a time")
+        self.assertEqual(4, estimate.breach_damage, "Every survivor should breach")
+        self.assertEqual(2 * estimate.frames, estimate_attack(game, [13, 0], "EI", 1, threats).frames, "Slower units should take longer to walk the same path")
+
+        for x in range(5, 23):
+            game.game_map.add_unit("FF", [x, 10], 0)
+        game.game_map.add_unit("FF", [4, 10], 0)
+        game.game_map.add_unit("FF", [23, 10], 0)
+        estimate = estimate_attack(game, [13, 0], "PI", 5)
+        self.assertEqual(False, estimate.reaches_edge, "A walled in group should not reach its edge")
+        self.assertEqual(0, estimate.breach_damage, "A walled in group should not score")
+
+    def test_fork(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("DF", [13, 10])
+        fork = game.fork()
+        self.assertEqual(game.config, fork.config, "Forks should share the config")
+
+        fork.attempt_spawn("FF", [[12, 10], [14, 10]])
+        fork.attempt_upgrade([13, 10])
+        fork.attempt_spawn("PI", [13, 0])
+        self.assertEqual(0, len(game.game_map[12, 10]), "Building in a fork should not change the original map")
+        self.assertEqual(False, game.game_map[13, 10][0].upgraded, "Upgrading in a fork should not change the original unit")
+        self.assertEqual(True, fork.game_map[13, 10][0].upgraded, "The fork should see its own upgrade")
+        self.assertEqual(False, game.game_map.is_blocked([14, 10]), "Forks should have their own bitboards")
+        self.assertNotEqual(game.get_resource(game.SP), fork.get_resource(game.SP), "Forks should have their own resources")
+        self.assertEqual(1, len(game._build_stack), "Forks should have their own build stack")
+
+        game.game_map.remove_unit([13, 10])
+        self.assertEqual(1, len(fork.game_map[13, 10]), "Changes to the original should not reach the fork")
+        self.assertEqual(game.find_path_to_edge([13, 0]), game.fork().find_path_to_edge([13, 0]), "Forks should path over the same board")
+
+        game = self.make_turn_0_map()
+        game.attempt_spawn("DF", [13, 10])
+        game.game_map[13, 10][0].damage_i = 50
+        fork = game.fork()
+        fork.game_map.add_unit("FF", [13, 11])
+        fork.game_map[13, 10][0].damage_i = 1
+        self.assertEqual(50, game.game_map[13, 10][0].damage_i, "Setting a stat in a fork should not change the original unit")
+        self.assertEqual(1, fork.game_map[13, 10][0].damage_i, "The fork should see its own stat")
+
+    def test_speculate(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("DF", [13, 10])
+        resources = game.get_resources()
+        original = game.game_map[13, 10][0]
+
+        with game.speculate():
+            game.attempt_spawn("FF", [12, 10])
+            game.attempt_upgrade([13, 10])
+            game.attempt_spawn("PI", [13, 0], 2)
+            self.assertEqual(True, game.game_map[13, 10][0].upgraded, "Changes should be visible inside a speculation")
+        self.assertEqual(resources, game.get_resources(), "Resources should be rolled back")
+        self.assertEqual(0, len(game.game_map[12, 10]), "Spawned structures should be rolled back")
+        self.assertEqual(0, len(game.game_map[13, 0]), "Spawned mobile units should be rolled back")
+        self.assertIs(original, game.game_map[13, 10][0], "The original unit should be put back")
+        self.assertEqual(False, original.upgraded, "Upgrades should be rolled back")
+        self.assertEqual(False, game.game_map.is_blocked([12, 10]), "The bitboard should be rolled back")
+        self.assertEqual(1, len(game._build_stack), "The build stack should be rolled back")
+        self.assertEqual(None, game._undo_log, "The undo log should be dropped after the outermost speculation")
+
+        with game.speculate() as outer:
+            game.attempt_spawn("FF", [12, 10])
+            savepoint = outer.savepoint()
+            game.attempt_spawn("FF", [14, 10])
+            with game.speculate() as inner:
+                game.attempt_spawn("FF", [15, 10])
+                inner.commit()
+            self.assertEqual(1, len(game.game_map[15, 10]), "Committed inner speculations should be kept by the outer one")
+            with game.speculate():
+                game.attempt_spawn("FF", [16, 10])
+            self.assertEqual(0, len(game.game_map[16, 10]), "Inner speculations should roll back on their own")
+            outer.rollback(savepoint)
+            self.assertEqual(0, len(game.game_map[14, 10]), "Rolling back to a savepoint should undo later changes")
+            self.assertEqual(1, len(game.game_map[12, 10]), "Rolling back to a savepoint should keep earlier changes")
+            outer.commit()
+        self.assertEqual(1, len(game.game_map[12, 10]), "Committed speculations should be kept")
+        self.assertEqual(0, len(game.game_map[15, 10]), "Rolled back changes should stay rolled back")
+        self.assertEqual(2, len(game._build_stack), "The build stack should match the kept changes")
+
+        with game.speculate() as speculation:
+            savepoint = speculation.savepoint()
+            fork = game.fork()
+            fork.attempt_spawn("FF", [13, 11])
+            fork.attempt_upgrade([12, 10])
+            self.assertEqual(savepoint, speculation.savepoint(), "Changes to a fork should not be logged in the original's speculation")
+        self.assertEqual(1, len(fork.game_map[13, 11]), "A fork made inside a speculation should keep its changes")
+        self.assertEqual(True, fork.game_map[12, 10][0].upgraded, "A fork made inside a speculation should keep its upgrades")
+        self.assertEqual(0, len(game.game_map[13, 11]), "A fork's changes should not reach the original")
+        self.assertEqual(False, game.game_map[12, 10][0].upgraded, "A fork's upgrades should not reach the original")
+
+        with self.assertRaises(ValueError):
+            with game.speculate() as speculation:
+                game.attempt_spawn("FF", [11, 10])
+                speculation.commit()
+                raise ValueError()
+        self.assertEqual(0, len(game.game_map[11, 10]), "Speculations should roll back when an exception is raised")
+
+    def test_pathing(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([[13, 0], [13, 1], [14, 1], [14, 2], [15, 2], [15, 3]], path[:6], "Units should zig zag towards their target edge")
+        self.assertEqual([27, 14], path[-1], "Unit did not end on its target edge")
+        self.assertEqual(29, len(path), "Path has the wrong length")
+
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 13]):
+                game.game_map.add_unit("FF", [x, 13])
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([26, 12], path[-1], "Unit should self destruct at the most ideal reachable tile")
+        self.assertEqual(None, game.find_path_to_edge([13, 13]), "We should not path from a blocked location")
+
+    def test_distance_field_cache(self):
+        game = self.make_turn_0_map()
+        spawns = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        for location in spawns:
+            game.find_path_to_edge(location)
+        cache = game._shortest_path_finder.get_distance_field_cache(game)
+        self.assertEqual(2, cache.searches, "Every start location should share the two edge fields")
+
+        game.game_map.add_unit("FF", [13, 1])
+        game.game_map.add_unit("FF", [12, 1])
+        game.game_map.add_unit("FF", [14, 1])
+        self.assertEqual([[13, 0], [14, 0]], game.find_path_to_edge([13, 0]), "A boxed in unit should self destruct in its pocket")
+        self.assertEqual(29, len(game.find_path_to_edge([0, 13])), "Paths should be rebuilt after the map changes")
+
+    def test_batch_pathing(self):
+        game = self.make_walled_map()
+        locations = [[13, 0], [0, 13], [27, 13], [13, 2], [13, 27]]
+        paths = game.find_paths_batch(locations)
+        self.assertEqual([game.find_path_to_edge(location) for location in locations], paths, "Batch paths should match single paths")
+        self.assertEqual(None, paths[3], "Blocked locations should not have a path")
+
+        spawn_paths = game.find_paths_from_all_spawns(1)
+        self.assertEqual(28, len(spawn_paths), "Every enemy spawn location should have a path")
+        self.assertEqual(game.find_path_to_edge([20, 21]), spawn_paths[(20, 21)], "Enemy spawn paths should match single paths")
+
+    def test_path_policy(self):
+        game = self.make_walled_map()
+        policy = game.get_path_policy([13, 0]).precompute()
+        for location in game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT):
+            self.assertEqual(game.find_path_to_edge(location), policy.get_path(location), "Policy paths should match single paths")
+        self.assertEqual(None, policy.get_path([13, 2]), "Blocked locations should not have a path")
+
+    def test_path_cache(self):
+        cache = ShortestPathFinder.enable_path_cache(2)
+        try:
+            game = self.make_turn_0_map()
+            path = game.find_path_to_edge([13, 0])
+            self.assertEqual((0, 1), (cache.hits, cache.misses), "The first lookup should miss")
+
+            next_turn = self.make_turn_0_map()
+            self.assertEqual(path, next_turn.find_path_to_edge([13, 0]), "Cached paths should match")
+            self.assertEqual((1, 1), (cache.hits, cache.misses), "A new GameState with the same board should hit")
+
+            next_turn.game_map.add_unit("FF", [20, 20], 1)
+            next_turn.find_path_to_edge([13, 0])
+            next_turn.find_path_to_edge([14, 0])
+            self.assertEqual((1, 3), (cache.hits, cache.misses), "Changed boards should miss")
+            self.assertEqual(2, len(cache), "The cache should not grow past its size")
+        finally:
+            ShortestPathFinder.disable_path_cache()
+
+    def test_what_if_block(self):
+        game = self.make_walled_map()
+        before = game.find_paths_from_all_spawns(1)
+        candidates = [[13, 12], [10, 13], [20, 13]]
+        paths = game.what_if_block(candidates)
+        self.assertEqual(before, game.find_paths_from_all_spawns(1), "A what if query should not change the map")
+
+        for location in candidates:
+            game.game_map.add_unit("FF", location)
+        self.assertEqual(game.find_paths_from_all_spawns(1), paths, "What if paths should match paths on the changed map")
+        self.assertEqual(before, game.what_if_unblock(candidates), "Unblocking should restore the original paths")
+
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 13]):
+                game.game_map.add_unit("FF", [x, 13])
+        paths = game.what_if_block([[13, 1], [12, 1], [14, 1]], [[13, 0]])
+        self.assertEqual([[13, 0], [14, 0]], paths[(13, 0)], "Cut off units should self destruct in their pocket")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
@@ -264,6 +727,74 @@ class BasicTests(unittest.TestCase):
         expected_string = "Enemy FF, health: 75.0 location: [14, 13] removal:  upgrade: False "
         self.assertEqual(got_string, expected_string, "Expected {} from print_unit test got {} ".format(expected_string, got_string))
 
+    def test_unit_stats(self):
+        game = self.make_turn_0_map()
+        first = GameUnit("DF", game.config, 0, None, 13, 10)
+        second = GameUnit("DF", game.config, 0, None, 14, 10)
+        type_config = game.config["unitInformation"][2]
+        self.assertIs(first._stats, second._stats, "Units of the same type should share their stats")
+        self.assertIs(game.config, first.config, "Units should still expose their config")
+        self.assertEqual(type_config["startHealth"], first.health, "Units should start at full health")
+        self.assertEqual([type_config["cost1"], type_config.get("cost2", 0)], first.cost, "Unit cost is wrong")
+
+        first.upgrade()
+        upgrade = type_config["upgrade"]
+        self.assertEqual(True, first.upgraded, "Upgrading should mark the unit as upgraded")
+        self.assertEqual(False, second.upgraded, "Upgrading one unit should not upgrade the others")
+        self.assertEqual(upgrade.get("attackRange", type_config["attackRange"]), first.attackRange, "Upgraded range is wrong")
+        self.assertEqual(type_config["cost1"] + upgrade.get("cost1", 0), first.cost[0], "Upgrade cost should be added to the unit cost")
+
+        second.damage_i = 100
+        self.assertEqual(100, second.damage_i, "Stats should still be settable")
+        self.assertEqual(type_config["attackDamageWalker"], GameUnit("DF", game.config).damage_i, "Setting a stat should not change other units")
+
+        second.cost = [1, 2]
+        self.assertEqual([1, 2], second.cost, "Cost should still be settable")
+        second.upgrade()
+        self.assertEqual(upgrade.get("attackDamageWalker", 100), second.damage_i, "Upgrading should keep stats the upgrade does not change")
+        self.assertEqual([1 + upgrade.get("cost1", 0), 2 + upgrade.get("cost2", 0)], second.cost, "Upgrade cost should be added to the set cost")
+        self.assertEqual(True, second.upgraded, "Upgrading a unit with its own stats should mark it as upgraded")
+        self.assertEqual([type_config["cost1"], type_config.get("cost2", 0)], GameUnit("DF", game.config).cost, "Setting the cost should not change other units")
+
+        third = GameUnit("DF", game.config)
+        third.upgraded = True
+        self.assertEqual(True, third.upgraded, "Upgraded should still be settable")
+        self.assertEqual(False, GameUnit("DF", game.config).upgraded, "Setting upgraded should not change other units")
+
+    def test_unit_store(self):
+        game = self.make_turn_0_map()
+        state = json.loads(game.serialized_string)
+        state["p1Units"].append([])
+        state["p2Units"].append([])
+        state["p1Units"][0].append([13, 13, 20.0, "1"])
+        state["p1Units"][2].append([13, 10, 75.0, "2"])
+        state["p1Units"][3].append([13, 0, 15.0, "3"])
+        state["p1Units"][3].append([13, 0, 15.0, "4"])
+        state["p1Units"][7].append([13, 10, 0, "5"])
+        state["p2Units"][2].append([14, 14, 10.0, "6"])
+        state["p2Units"][6].append([14, 14, 0, "7"])
+        game = GameState(game.config, json.dumps(state))
+        store = UnitStore.from_state(game.config, state)
+
+        self.assertEqual(5, len(store), "Every unit should get a slot")
+        for location in [[13, 13], [13, 10], [13, 0], [14, 14], [0, 13]]:
+            self.assertEqual(str(game.game_map[location[0], location[1]]), str(store[location[0], location[1]]), "Tile views should match the GameMap")
+        self.assertEqual(str(store[13, 0]), str(UnitStore.from_game_map(game.game_map)[13, 0]), "Copying a GameMap should give the same units")
+        self.assertIs(store[13, 0], store[13, 0], "Tile views should be kept until the tile changes")
+
+        self.assertEqual([[14, 14]], store.get_locations(store.get_slots(1, ["DF"])), "Enemy turrets are wrong")
+        self.assertEqual(4, len(store.get_slots(0)), "My units are wrong")
+        self.assertEqual([[13, 13]], store.get_locations(store.find_low_health(0.5, 0, ["FF", "EF", "DF"])), "Only the damaged wall is below half health")
+        self.assertEqual(1, len(store.find_low_health(0.5, 1)), "The damaged enemy turret is below half health")
+
+        store.remove_unit([13, 13])
+        store.add_unit("DF", [13, 0], 0)
+        self.assertEqual(0, len(store[13, 13]), "Removed units should leave their tile")
+        self.assertEqual(["DF"], [unit.unit_type for unit in store[13, 0]], "Structures should replace the units on their tile")
+        self.assertEqual([], store.find_low_health(0.5, 0), "Removed units should not be found")
+        store.upgrade([13, 0])
+        self.assertEqual(True, store[13, 0][0].upgraded, "Upgrades should show in the tile view")
+
     def test_future_MP(self):
         game = self.make_turn_0_map()
 
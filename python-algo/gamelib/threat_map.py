@@ -0,0 +1,106 @@
+from .game_map import ARENA_SIZE, NUM_TILES, get_range_stencil
+
+
+class ThreatMap:
+    """The damage enemy structures deal to mobile units on every tile of the board.
+
+    A structure attacks a mobile unit if it deals damage and the unit is within its attackRange,
+    the same rule as GameState.get_attackers. Only structures are counted, while get_attackers also
+    returns enemy mobile units that deal damage, so the two only agree on boards without mobile units. Each structure's contribution is added with a
+    precomputed range stencil, so building the map is one pass over the structures and adding or
+    removing a structure only touches the tiles it covers.
+
+    Attributes :
+        * game_map (GameMap): The map the threat map was built from
+
+    """
+    def __init__(self, game_state):
+        """ Builds the threat map from every structure on the board
+
+        Args:
+            game_state: The GameState to read structures from
+
+        """
+        self.game_map = game_state.game_map
+        self._damage = [[0] * NUM_TILES, [0] * NUM_TILES]
+        self._attackers = [[0] * NUM_TILES, [0] * NUM_TILES]
+        bits = self.game_map.get_structure_bitboard()
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            bits ^= low
+            for unit in self.game_map[index // ARENA_SIZE, index % ARENA_SIZE]:
+                if unit.stationary:
+                    self.add_structure(unit)
+
+    def add_structure(self, unit):
+        """Adds the threat of a structure. Call this after a structure is built.
+
+        Args:
+            unit: The GameUnit of the structure, at its final location and upgrade level
+
+        """
+        self.__apply(unit, 1)
+
+    def remove_structure(self, unit):
+        """Removes the threat of a structure. Call this before a structure is destroyed or upgraded,
+        while its stats still match what was added.
+
+        Args:
+            unit: The GameUnit that was passed to add_structure
+
+        """
+        self.__apply(unit, -1)
+
+    def __apply(self, unit, sign):
+        if not unit.stationary or unit.damage_i + unit.damage_f <= 0 or unit.player_index not in (0, 1):
+            return
+        damage = self._damage[1 - unit.player_index]
+        attackers = self._attackers[1 - unit.player_index]
+        amount = sign * unit.damage_i
+        for x, y in get_range_stencil(unit.attackRange, 0, True).locations(unit.x, unit.y):
+            index = x * ARENA_SIZE + y
+            damage[index] += amount
+            attackers[index] += sign
+
+    def get_damage(self, location, player_index):
+        """Gets the damage per frame a mobile unit takes from enemy structures at a location
+
+        Args:
+            location: The location of the mobile unit
+            player_index: The player that controls the mobile unit, 0 for you 1 for the enemy
+
+        Returns:
+            The total damage_i of the enemy structures in range of the location
+
+        """
+        if not self.__validate(location, player_index):
+            return 0
+        x, y = location
+        return self._damage[player_index][x * ARENA_SIZE + y]
+
+    def get_attacker_count(self, location, player_index):
+        """Gets the number of enemy structures that would attack a mobile unit at a location
+
+        Args:
+            location: The location of the mobile unit
+            player_index: The player that controls the mobile unit, 0 for you 1 for the enemy
+
+        Returns:
+            The number of enemy structures in range that deal damage. This is the number of units
+            get_attackers would return only when there are no enemy mobile units on the board
+
+        """
+        if not self.__validate(location, player_index):
+            return 0
+        x, y = location
+        return self._attackers[player_index][x * ARENA_SIZE + y]
+
+    def __validate(self, location, player_index):
+        if player_index != 0 and player_index != 1:
+            self.game_map.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(player_index))
+            return False
+        if not self.game_map.in_arena_bounds(location):
+            self.game_map.warn("Location {} is not in the arena bounds.".format(location))
+            return False
+        return True
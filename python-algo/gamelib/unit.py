@@ -9,9 +9,141 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+class UnitStats:
+    """The stats shared by every unit of one type and upgrade level.
+
+    Attributes :
+        * unit_type (string): The type these stats are for
+        * table (UnitTypeTable): The table this record belongs to
+        * upgraded (boolean): If these are the stats of an upgraded unit
+        * stationary (bool): Whether or not units of this type are structures
+        * speed (float): A unit will move once every 1/speed frames
+        * damage_f (int): The amount of damage dealt to enemy structures
+        * damage_i (int): The amount of damage dealt to enemy mobile units
+        * attackRange (float): The effective range for attacking
+        * shieldRange (float): The effective range for shielding
+        * max_health (float): The starting health
+        * shieldPerUnit (float): how much shield is given per unit
+        * shieldBonusPerY (float): how much extra shield is given per row away from the owner's edge
+        * cost ((int, int)): The resource costs, first is SP second is MP
+
+    """
+    __slots__ = ("unit_type", "table", "upgraded", "stationary", "speed", "damage_f", "damage_i", "attackRange",
+                 "shieldRange", "max_health", "shieldPerUnit", "shieldBonusPerY", "cost")
+
+    def __init__(self, unit_type, table, type_config, base=None):
+        """ Reads the stats of a unit type from its entry in config["unitInformation"]
+
+        Args:
+            unit_type: The shorthand of the unit type
+            table: The UnitTypeTable building this record
+            type_config: The config entry to read, the "upgrade" entry for upgraded stats
+            base: The stats of the unit before upgrading, None for base stats
+
+        """
+        self.unit_type = unit_type
+        self.table = table
+        self.upgraded = base is not None
+        if base is None:
+            self.stationary = type_config.get("unitCategory") == 0
+            self.speed = type_config.get("speed", 0)
+            self.damage_f = type_config.get("attackDamageTower", 0)
+            self.damage_i = type_config.get("attackDamageWalker", 0)
+            self.attackRange = type_config.get("attackRange", 0)
+            self.shieldRange = type_config.get("shieldRange", 0)
+            self.max_health = type_config.get("startHealth", 0)
+            self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
+            self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
+            self.cost = (type_config.get("cost1", 0), type_config.get("cost2", 0))
+        else:
+            self.stationary = base.stationary
+            self.speed = type_config.get("speed", base.speed)
+            self.damage_f = type_config.get("attackDamageTower", base.damage_f)
+            self.damage_i = type_config.get("attackDamageWalker", base.damage_i)
+            self.attackRange = type_config.get("attackRange", base.attackRange)
+            self.shieldRange = type_config.get("shieldRange", base.shieldRange)
+            self.max_health = type_config.get("startHealth", base.max_health)
+            self.shieldPerUnit = type_config.get("shieldPerUnit", base.shieldPerUnit)
+            self.shieldBonusPerY = type_config.get("shieldBonusPerY", base.shieldBonusPerY)
+            self.cost = (type_config.get("cost1", 0) + base.cost[0], type_config.get("cost2", 0) + base.cost[1])
+
+    def copy(self):
+        """Gets a copy of this record that can be changed without affecting other units
+        """
+        copied = UnitStats.__new__(UnitStats)
+        for name in UnitStats.__slots__:
+            setattr(copied, name, getattr(self, name))
+        return copied
+
+
+class UnitTypeTable:
+    """The base and upgraded stats of every unit type in a config, read once and shared by every GameUnit.
+
+    Use UnitTypeTable.for_config to get the table of a config instead of building a new one.
+
+    Attributes :
+        * config (JSON): The config the table was read from
+        * base (dict): The UnitStats of each unit type before upgrading, keyed by shorthand
+        * upgraded (dict): The UnitStats of each unit type after upgrading, keyed by shorthand
+
+    """
+    _tables = {}
+
+    def __init__(self, config):
+        """ Reads the stats of every unit type in config["unitInformation"]
+
+        Args:
+            config: A json object containing information about the game
+
+        """
+        self.config = config
+        self.base = {}
+        self.upgraded = {}
+        self._upgrade_configs = {}
+        for type_config in config["unitInformation"]:
+            unit_type = type_config.get("shorthand")
+            if unit_type is None:
+                continue
+            base = UnitStats(unit_type, self, type_config)
+            self.base[unit_type] = base
+            self._upgrade_configs[unit_type] = type_config.get("upgrade", {})
+            self.upgraded[unit_type] = UnitStats(unit_type, self, self._upgrade_configs[unit_type], base)
+
+    @classmethod
+    def for_config(cls, config):
+        """Gets the table for a config, building it the first time the config is seen
+
+        Args:
+            config: A json object containing information about the game
+
+        Returns:
+            The UnitTypeTable of the config
+
+        """
+        table = cls._tables.get(id(config))
+        if table is None or table.config is not config:
+            table = cls(config)
+            cls._tables[id(config)] = table
+        return table
+
+
+def _stat(name):
+    def get(self):
+        return getattr(self._stats, name)
+
+    def set(self, value):
+        setattr(self._own_stats(), name, value)
+    return property(get, set)
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    The stats of a unit point to a UnitStats record shared by every unit of the same type and
+    upgrade level, so creating and upgrading units does not read the config. Setting a stat
+    gives the unit its own copy of the record, and upgrading a unit with its own record applies
+    the upgrade on top of the values it was given.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -32,48 +164,65 @@ class GameUnit:
         * upgraded (boolean): If this unit is upgraded
 
     """
+    __slots__ = ("unit_type", "player_index", "pending_removal", "x", "y", "health", "_stats")
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
         self.player_index = player_index
         self.pending_removal = False
-        self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self._stats = UnitTypeTable.for_config(config).base[unit_type]
+        self.health = self._stats.max_health if not health else health
+
+    config = property(lambda self: self._stats.table.config)
+    upgraded = _stat("upgraded")
+    stationary = _stat("stationary")
+    speed = _stat("speed")
+    damage_f = _stat("damage_f")
+    damage_i = _stat("damage_i")
+    attackRange = _stat("attackRange")
+    shieldRange = _stat("shieldRange")
+    max_health = _stat("max_health")
+    shieldPerUnit = _stat("shieldPerUnit")
+    shieldBonusPerY = _stat("shieldBonusPerY")
+
+    @property
+    def cost(self):
+        return list(self._stats.cost)
+
+    @cost.setter
+    def cost(self, value):
+        self._own_stats().cost = tuple(value)
+
+    def _is_shared(self):
+        table = self._stats.table
+        return self._stats is table.base.get(self.unit_type) or self._stats is table.upgraded.get(self.unit_type)
+
+    def _own_stats(self):
+        # Give this unit its own record so the shared one is left alone
+        if self._is_shared():
+            self._stats = self._stats.copy()
+        return self._stats
 
+    def __copy__(self):
+        copied = GameUnit.__new__(GameUnit)
+        for name in GameUnit.__slots__:
+            setattr(copied, name, getattr(self, name))
+        # A record of this unit's own is copied too, so setting a stat on one copy leaves the other alone
+        if not self._is_shared():
+            copied._stats = self._stats.copy()
+        return copied
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
-        self.upgraded = True
+        table = self._stats.table
+        if self._is_shared():
+            self._stats = table.upgraded[self.unit_type]
+        else:
+            self._stats = UnitStats(self.unit_type, table, table._upgrade_configs[self.unit_type], self._stats)
 
 
     def __toString(self):
@@ -0,0 +1,247 @@
+from array import array
+
+from .game_map import ARENA_SIZE, NUM_TILES, VALID_LOCATIONS
+from .unit import GameUnit, UnitTypeTable
+from .util import load_state
+
+
+class UnitStore:
+    """The units on the board kept as parallel typed arrays, one entry per unit, instead of GameUnit objects.
+
+    Every unit gets a slot, and slot i of each array holds one of its fields. Tiles keep the slots of
+    the units on them and every (player_index, type_id) pair keeps a list of its slots, so scans such as
+    "every enemy turret" or "my structures below half health" read a short list of numbers instead of
+    walking all 28x28 tiles. store[x, y] still gives a list of GameUnits, built the first time a tile
+    is read and kept until that tile changes. Those GameUnits are a view: change units through the store.
+
+    Removed units leave an empty slot (type_id -1) that is skipped by every query.
+
+    Attributes :
+        * config (JSON): Contains information about the current game rules
+        * type_id (array): The index into config["unitInformation"] of each unit, -1 for a removed unit
+        * owner (array): The player_index of each unit
+        * x (array): The x coordinate of each unit
+        * y (array): The y coordinate of each unit
+        * health (array): The current health of each unit
+        * max_health (array): The starting health of each unit, after upgrades
+        * upgraded (array): 1 if a unit is upgraded
+        * pending_removal (array): 1 if a unit is marked for removal by its owner
+
+    """
+    def __init__(self, config):
+        """ Creates an empty store
+
+        Args:
+            config (JSON): Contains information about the game
+
+        """
+        self.config = config
+        self._table = UnitTypeTable.for_config(config)
+        self._shorthands = [type_config.get("shorthand") for type_config in config["unitInformation"]]
+        self._type_ids = {shorthand: i for i, shorthand in enumerate(self._shorthands)}
+        self.type_id = array("b")
+        self.owner = array("b")
+        self.x = array("b")
+        self.y = array("b")
+        self.health = array("d")
+        self.max_health = array("d")
+        self.upgraded = array("b")
+        self.pending_removal = array("b")
+        self._tiles = [None] * NUM_TILES
+        self._views = {}
+        self._groups = {}
+
+    @classmethod
+    def from_state(cls, config, state):
+        """Fills a store from a game state without creating any GameUnits
+
+        Args:
+            config (JSON): Contains information about the game
+            state: The game state, as a json string, a GameMessage or an already decoded dict
+
+        Returns:
+            A UnitStore holding every unit in the state
+
+        """
+        state = load_state(state)
+        store = cls(config)
+        remove, upgrade = store._shorthands[6], store._shorthands[7]
+        for player_index, key in enumerate(["p1Units", "p2Units"]):
+            for type_id, units in enumerate(state[key]):
+                unit_type = store._shorthands[type_id]
+                for unit in units:
+                    x, y = int(unit[0]), int(unit[1])
+                    # This depends on RM and UP always being the last types to be processed
+                    if unit_type == remove:
+                        for slot in store._structure_slots(x, y):
+                            store.pending_removal[slot] = 1
+                    elif unit_type == upgrade:
+                        for slot in store._structure_slots(x, y):
+                            store._upgrade_slot(slot)
+                    else:
+                        store.add_unit(unit_type, [x, y], player_index, float(unit[2]))
+        return store
+
+    @classmethod
+    def from_game_map(cls, game_map):
+        """Copies every unit of a GameMap into a new store
+
+        Args:
+            game_map: The GameMap to copy
+
+        Returns:
+            A UnitStore holding the same units
+
+        """
+        store = cls(game_map.config)
+        for x, y in VALID_LOCATIONS:
+            for unit in game_map[x, y]:
+                slot = store.add_unit(unit.unit_type, [x, y], unit.player_index, unit.health)
+                if unit.upgraded:
+                    store._upgrade_slot(slot)
+                store.pending_removal[slot] = 1 if unit.pending_removal else 0
+        return store
+
+    def __getitem__(self, location):
+        x, y = location
+        index = x * ARENA_SIZE + y
+        view = self._views.get(index)
+        if view is None:
+            view = [self.get_unit(slot) for slot in self._tiles[index] or ()]
+            self._views[index] = view
+        return view
+
+    def __len__(self):
+        return sum(len(slots) for slots in self._groups.values())
+
+    def add_unit(self, unit_type, location, player_index=0, health=None):
+        """Adds a unit to the store. Like GameMap.add_unit, a structure replaces whatever is on its tile.
+
+        Args:
+            unit_type: The type of the new unit
+            location: The [x, y] location of the new unit
+            player_index: The player controlling the new unit, 0 for you 1 for the enemy
+            health: The health of the new unit, defaults to its starting health
+
+        Returns:
+            The slot of the new unit
+
+        """
+        x, y = map(int, location)
+        stats = self._table.base[unit_type]
+        if stats.stationary:
+            self.remove_unit([x, y])
+        type_id = self._type_ids[unit_type]
+        slot = len(self.type_id)
+        self.type_id.append(type_id)
+        self.owner.append(player_index)
+        self.x.append(x)
+        self.y.append(y)
+        self.health.append(health if health else stats.max_health)
+        self.max_health.append(stats.max_health)
+        self.upgraded.append(0)
+        self.pending_removal.append(0)
+        index = x * ARENA_SIZE + y
+        if self._tiles[index] is None:
+            self._tiles[index] = []
+        self._tiles[index].append(slot)
+        self._groups.setdefault((player_index, type_id), []).append(slot)
+        self._views.pop(index, None)
+        return slot
+
+    def remove_unit(self, location):
+        """Removes every unit on a tile
+
+        Args:
+            location: The [x, y] location to empty
+
+        """
+        x, y = map(int, location)
+        index = x * ARENA_SIZE + y
+        for slot in self._tiles[index] or ():
+            self._groups[(self.owner[slot], self.type_id[slot])].remove(slot)
+            self.type_id[slot] = -1
+        self._tiles[index] = None
+        self._views.pop(index, None)
+
+    def upgrade(self, location):
+        """Upgrades the structure on a tile, if there is one
+
+        Args:
+            location: The [x, y] location of the structure
+
+        """
+        x, y = map(int, location)
+        for slot in self._structure_slots(x, y):
+            self._upgrade_slot(slot)
+        self._views.pop(x * ARENA_SIZE + y, None)
+
+    def _upgrade_slot(self, slot):
+        self.upgraded[slot] = 1
+        self.max_health[slot] = self._table.upgraded[self._shorthands[self.type_id[slot]]].max_health
+
+    def _structure_slots(self, x, y):
+        return [slot for slot in self._tiles[x * ARENA_SIZE + y] or () if self._table.base[self._shorthands[self.type_id[slot]]].stationary]
+
+    def get_unit(self, slot):
+        """Builds a GameUnit from a slot
+
+        Args:
+            slot: The slot of a unit
+
+        Returns:
+            A new GameUnit with the unit's type, owner, location and health
+
+        """
+        unit = GameUnit(self._shorthands[self.type_id[slot]], self.config, self.owner[slot], self.health[slot], self.x[slot], self.y[slot])
+        if self.upgraded[slot]:
+            unit.upgrade()
+        unit.pending_removal = bool(self.pending_removal[slot])
+        return unit
+
+    def get_slots(self, player_index=None, unit_types=None):
+        """Gets the slots of every unit belonging to a player and of the given types
+
+        Args:
+            player_index: The player whose units we want, 0 for you 1 for the enemy. Both players if None.
+            unit_types: A list of unit types to include. Every type if None.
+
+        Returns:
+            A list of slots
+
+        """
+        players = (0, 1) if player_index is None else (player_index,)
+        type_ids = range(len(self._shorthands)) if unit_types is None else [self._type_ids[unit_type] for unit_type in unit_types]
+        slots = []
+        for owner in players:
+            for type_id in type_ids:
+                slots.extend(self._groups.get((owner, type_id), ()))
+        return slots
+
+    def get_locations(self, slots):
+        """Gets the [x, y] locations of a list of slots
+
+        Args:
+            slots: A list of slots
+
+        Returns:
+            A list of locations, in the same order as the slots
+
+        """
+        return [[self.x[slot], self.y[slot]] for slot in slots]
+
+    def find_low_health(self, fraction, player_index=None, unit_types=None):
+        """Gets the units whose health is at or below a fraction of their max_health
+
+        Args:
+            fraction: The fraction of max_health to compare against, 0.5 for units at half health or less
+            player_index: The player whose units we want, 0 for you 1 for the enemy. Both players if None.
+            unit_types: A list of unit types to include. Every type if None.
+
+        Returns:
+            A list of slots
+
+        """
+        health = self.health
+        max_health = self.max_health
+        return [slot for slot in self.get_slots(player_index, unit_types) if health[slot] <= max_health[slot] * fraction]
@@ -1,4 +1,6 @@
+import re
 import sys
+import json
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
@@ -39,3 +41,61 @@ def debug_write(*msg):
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
+
+
+_TURN_INFO = re.compile(r'"turnInfo"\s*:\s*\[\s*(-?\d+)\s*,\s*(-?\d+)\s*,\s*(-?\d+)')
+
+
+class GameMessage(str):
+    """A line received from the game engine. It is still the raw string, so it can be passed anywhere
+    a string is expected, but it also carries the decoded json so handlers do not decode it again.
+
+    Attributes :
+        * state (dict): The decoded json, decoded the first time it is read and then kept
+        * turn_info (list): The first three turnInfo values [phase, turn, frame], read without decoding the rest of the message, or None
+
+    """
+    __slots__ = ("_state", "_turn_info")
+
+    @property
+    def state(self):
+        try:
+            return self._state
+        except AttributeError:
+            self._state = json.loads(self)
+            return self._state
+
+    @property
+    def turn_info(self):
+        try:
+            return self._turn_info
+        except AttributeError:
+            pass
+        # The engine does not put turnInfo first, so find it and read just the numbers after it
+        turn_info = None
+        start = self.find('"turnInfo"')
+        if start >= 0:
+            match = _TURN_INFO.match(self, start)
+            if match is not None:
+                turn_info = [int(value) for value in match.groups()]
+            else:
+                turn_info = [int(value) for value in self.state["turnInfo"][:3]]
+        self._turn_info = turn_info
+        return turn_info
+
+
+def load_state(message):
+    """Gets the decoded json of a game engine message, decoding it only if that has not been done yet
+
+    Args:
+        message: A GameMessage, a json string, or an already decoded dict
+
+    Returns:
+        The decoded dict
+
+    """
+    if isinstance(message, GameMessage):
+        return message.state
+    if isinstance(message, dict):
+        return message
+    return json.loads(message)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+This is a script to check how closely gamelib's local action phase simulator (gamelib/simulator.py)
+follows real games, using the action frames recorded in replay files.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Replays record every frame of the action phase (turnInfo[0] == 1) with the full unit lists and
+stats of both players. For every turn, this script seeds the simulator with the first action frame,
+steps it one frame at a time, and compares it to each recorded frame that follows:
+
+	- positions : units present in one but not the other, matched on type, owner and tile
+	- health    : total health difference of the units that were matched
+	- score     : difference in health taken from each player by breaches
+
+You can run it on every replay in the replays folder with:
+>py scripts/contributions/validate_simulator.py
+
+Or on specific replays, or every replay in a directory:
+>py scripts/contributions/validate_simulator.py -f replays/game1.replay replays/game2.replay
+>py scripts/contributions/validate_simulator.py -d path/to/replays
+
+Replays are checked in parallel, one per process. Use -p to set the number of processes,
+and -v to print every frame that diverges instead of a summary per replay.
+'''
+
+import os
+import sys
+import json
+import glob
+import argparse
+import multiprocessing
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'python-algo'))
+
+from gamelib import GameState
+from gamelib.simulator import Simulator
+
+ACTION_PHASE = 1
+NUM_UNIT_TYPES = 6
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-f", "--file",
+		nargs="*",
+		default=[],
+		help="specify a replay file (or multiple) you'd like to check\n\n")
+	ap.add_argument(
+		"-d", "--dir",
+		default=os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'replays'),
+		help="directory to take every .replay file from when no files are given\n\n")
+	ap.add_argument(
+		"-p", "--processes",
+		type=int,
+		default=multiprocessing.cpu_count(),
+		help="number of replays to check at the same time\n\n")
+	ap.add_argument(
+		"-v", "--verbose",
+		action='store_true',
+		help="print every diverging frame\n\n")
+	return vars(ap.parse_args())
+
+
+# reads the config and the action frames of every turn from a replay file
+def load_replay(f_name):
+	config = None
+	turns = defaultdict(list)
+	with open(f_name) as f:
+		for line in f:
+			line = line.strip()
+			if line == '':
+				continue
+			data = json.loads(line)
+			if 'debug' in data:
+				config = data
+			elif data['turnInfo'][0] == ACTION_PHASE:
+				turns[data['turnInfo'][1]].append(data)
+	for frames in turns.values():
+		frames.sort(key=lambda frame: frame['turnInfo'][2])
+	return config, turns
+
+
+# the units of a recorded frame in the same format as Simulator.snapshot
+def recorded_units(config, frame):
+	units = []
+	for player_index, key in enumerate(['p1Units', 'p2Units']):
+		for type_index, unit_list in enumerate(frame[key][:NUM_UNIT_TYPES]):
+			unit_type = config['unitInformation'][type_index]['shorthand']
+			for unit in unit_list:
+				units.append((unit_type, [int(unit[0]), int(unit[1])], player_index, float(unit[2])))
+	return units
+
+
+# compares the simulator to a recorded frame, returning the number of unmatched units, the health difference of matched units, and the score difference
+def compare(simulated, recorded, simulated_score, recorded_score):
+	simulated_health = defaultdict(list)
+	recorded_health = defaultdict(list)
+	for unit_type, location, player_index, health in simulated:
+		simulated_health[(unit_type, location[0], location[1], player_index)].append(health)
+	for unit_type, location, player_index, health in recorded:
+		recorded_health[(unit_type, location[0], location[1], player_index)].append(health)
+
+	unmatched = 0
+	health_error = 0
+	for key in set(simulated_health) | set(recorded_health):
+		a = sorted(simulated_health.get(key, []))
+		b = sorted(recorded_health.get(key, []))
+		unmatched += abs(len(a) - len(b))
+		health_error += sum(abs(x - y) for x, y in zip(a, b))
+	score_error = sum(abs(simulated_score[i] - recorded_score[i]) for i in range(2))
+	return unmatched, health_error, score_error
+
+
+# runs the simulator over every turn of one replay
+def validate_replay(f_name, verbose=False):
+	summary = Counter()
+	diverging = []
+	try:
+		config, turns = load_replay(f_name)
+	except (OSError, ValueError, KeyError) as e:
+		return f_name, None, ['Could not read replay: {}'.format(e)]
+	if config is None:
+		return f_name, None, ['No config line found']
+
+	for turn, frames in sorted(turns.items()):
+		first = frames[0]
+		game_state = GameState(config, first)
+		game_state.suppress_warnings(True)
+		simulator = Simulator(game_state)
+		start_health = [first['p1Stats'][0], first['p2Stats'][0]]
+		summary['turns'] += 1
+		first_divergence = None
+
+		for frame in frames[1:]:
+			simulator.step()
+			# health taken from player 2 is player 1's score and the other way around
+			recorded_score = [start_health[1] - frame['p2Stats'][0], start_health[0] - frame['p1Stats'][0]]
+			unmatched, health_error, score_error = compare(simulator.snapshot(), recorded_units(config, frame), simulator.points_scored, recorded_score)
+			summary['frames'] += 1
+			summary['unmatched'] += unmatched
+			summary['health_error'] += health_error
+			summary['score_error'] += score_error
+			if unmatched or health_error or score_error:
+				summary['diverging_frames'] += 1
+				if first_divergence is None:
+					first_divergence = frame['turnInfo'][2]
+				if verbose:
+					diverging.append('turn {} frame {}: {} unmatched units, {:.1f} health, {:.1f} score'.format(turn, frame['turnInfo'][2], unmatched, health_error, score_error))
+		if first_divergence is not None:
+			summary['diverging_turns'] += 1
+	return f_name, dict(summary), diverging
+
+
+def validate_replay_args(args):
+	return validate_replay(*args)
+
+
+def print_summary(f_name, summary, diverging):
+	print('-----------------------------------------------------------------------------------')
+	print(os.path.basename(f_name))
+	for line in diverging:
+		print('|      {}'.format(line))
+	if summary is None:
+		return
+	frames = max(summary.get('frames', 0), 1)
+	print('|      turns: {}, diverging turns: {}'.format(summary.get('turns', 0), summary.get('diverging_turns', 0)))
+	print('|      frames: {}, diverging frames: {} ({:.1%})'.format(summary.get('frames', 0), summary.get('diverging_frames', 0), summary.get('diverging_frames', 0) / frames))
+	print('|      per frame: {:.2f} unmatched units, {:.2f} health error, {:.3f} score error'.format(
+		summary.get('unmatched', 0) / frames, summary.get('health_error', 0) / frames, summary.get('score_error', 0) / frames))
+
+
+def main(args):
+	files = args['file'] or sorted(glob.glob(os.path.join(args['dir'], '*.replay')))
+	if not files:
+		sys.stderr.write('No replays found\n')
+		return
+
+	total = Counter()
+	work = [(f_name, args['verbose']) for f_name in files]
+	with multiprocessing.Pool(max(1, min(args['processes'], len(files)))) as pool:
+		for f_name, summary, diverging in pool.imap_unordered(validate_replay_args, work):
+			print_summary(f_name, summary, diverging)
+			if summary is not None:
+				total.update(summary)
+
+	print('===================================================================================')
+	print_summary('All {} replays'.format(len(files)), dict(total), [])
+
+
+if __name__ == '__main__':
+	main(parse_args())